@@ -16,7 +16,8 @@ import io
 import itertools
 from collections import Counter
 
-from core.db import get_all_data, get_all_chats, init_db
+from core.db import query_all_data, get_sources, init_db, get_mention_keys_by_row, get_mention_items, archive_months
+from core.lang import ZH_PATTERN, CJK_PATTERN, TH_PATTERN, TH_RUN_PATTERN, EN_WORD_PATTERN, NUMERIC_PATTERN
 # These were unused in the UI and causing ImportErrors due to missing/moved functions
 # from core.analysis import analyze_sentiment, detailed_aspect_analysis
 
@@ -71,21 +72,21 @@ def smart_tokenize(text, source=None, stopwords=None):
     text = text.lower()
     
     # 1. Detect Thai Content (Thai characters: \u0E00-\u0E7F)
-    if re.search(r'[\u0E00-\u0E7F]', text):
+    if TH_PATTERN.search(text):
         if HAS_SPECIALIZED:
             words = thai_tokenize(text, engine="newmm")
         else:
-            words = re.findall(r'[\u0E00-\u0E7F]+', text)
+            words = TH_RUN_PATTERN.findall(text)
             
     # 2. Detect Chinese Content (Simplified & Traditional)
     # Using a broader range \u4e00-\u9fff and source hints
-    elif re.search(r'[\u4e00-\u9fff]', text) or (source and source.lower() in ['youtube', 'bahamut', 'discord']):
+    elif CJK_PATTERN.search(text) or (source and source.lower() in ['youtube', 'bahamut', 'discord']):
         words = list(jieba.cut(text))
         
     # 3. Primarily International / English
     else:
         # Regex for words
-        raw_words = re.findall(r'\b[a-z]{2,}\b', text)
+        raw_words = EN_WORD_PATTERN.findall(text)
         if HAS_SPECIALIZED:
             # Lemmatize English words
             words = [lemmatizer.lemmatize(w) for w in raw_words]
@@ -95,8 +96,8 @@ def smart_tokenize(text, source=None, stopwords=None):
     # 4. Global Filtering
     if stopwords:
         # Keep single characters if they are Chinese (very important for sentiment like '贵', '卡', '坑')
-        return [w.strip() for w in words if (len(w.strip()) > 1 or re.search(r'[\u4e00-\u9fa5]', w)) and w.strip() not in stopwords and not re.match(r'^[0-9.]+$', w)]
-    return [w.strip() for w in words if (len(w.strip()) > 1 or re.search(r'[\u4e00-\u9fa5]', w)) and not re.match(r'^[0-9.]+$', w)]
+        return [w.strip() for w in words if (len(w.strip()) > 1 or ZH_PATTERN.search(w)) and w.strip() not in stopwords and not NUMERIC_PATTERN.match(w)]
+    return [w.strip() for w in words if (len(w.strip()) > 1 or ZH_PATTERN.search(w)) and not NUMERIC_PATTERN.match(w)]
 
 
 def load_stopwords():
@@ -123,6 +124,35 @@ def format_tooltip(meta):
     
     return html.escape(f"完整评论: {clean_c}\n来源: {source}\n时间: {date}")
 
+def _tooltip_date(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d') if value == value.normalize() else value.strftime('%Y-%m-%d %H:%M:%S')
+    return value if pd.notna(value) else '未知'
+
+def iter_mention_items(df, kind, filters=None):
+    """
+    (key, dimension, item) for every hero ("hero") or aspect ("aspect") mention of
+    the rows in df, in row order, read from the mentions table. item has the
+    detailed_analysis item shape, with tooltip metadata taken from the row.
+    filters: the sidebar's data_filters, so only the matching mentions are read
+    """
+    items = get_mention_items(kind, **(filters or {}))
+    if items.empty or df.empty:
+        return
+    rows = df[['id', 'content', 'source', 'review_date']].reset_index(drop=True)
+    rows['row_pos'] = rows.index
+    merged = rows.merge(items, left_on='id', right_on='row_id').sort_values(['row_pos', 'seq'], kind='stable')
+    for rec in merged.itertuples(index=False):
+        item = {
+            "text": rec.text,
+            "label": rec.label,
+            "score": rec.score,
+            "metadata": {"source": rec.source, "date": _tooltip_date(rec.review_date), "full_content": rec.content or ""}
+        }
+        if kind == "aspect":
+            item["tags"] = rec.tags.split(",") if rec.tags else []
+        yield rec.key, rec.dimension, item
+
 def load_events():
     events_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'events.json')
     if os.path.exists(events_path):
@@ -341,12 +371,29 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_data(ttl=60)
-def load_data(game_filter=None):
+def load_sources(game_filter=None):
     init_db()
-    df = get_all_data()
+    return get_sources(game_filter)
+
+# Columns each page renders; load_data reads only these (pages missing here need no rows).
+# Hero/aspect details come from the mentions table, so no page loads detailed_analysis.
+PAGE_COLUMNS = {
+    "📊 总览大屏": ("id", "review_date", "sentiment_score", "sentiment_label", "rating", "content", "source"),
+    "🧭 评论搜索": ("id", "review_date", "sentiment_score", "rating", "content", "source", "author", "x", "y", "cluster_label"),
+    "📚 漫画专项": ("id", "review_date", "sentiment_score"),
+    "🦸 英雄专项": ("id", "review_date", "sentiment_score", "content", "source"),
+    "⚙️ 玩法反馈": ("id", "review_date", "content", "source"),
+}
+
+@st.cache_data(ttl=60)
+def load_data(game_filter=None, start_date=None, end_date=None, sources=None, columns=None):
+    init_db()
+    # Game, date range and sources are filtered in SQL; only matching rows (and columns) are loaded
+    df = query_all_data(game_id=game_filter, start_date=start_date, end_date=end_date, sources=sources, columns=columns)
     if not df.empty:
         if 'review_date' in df.columns:
             df['review_date'] = df['review_date'].apply(lambda x: pd.to_datetime(str(x), errors='coerce') if pd.notnull(x) else pd.NaT)
+            df = df[df['review_date'].notna()]
         if 'sentiment_score' in df.columns:
             df['sentiment_score'] = pd.to_numeric(df['sentiment_score'], errors='coerce')
         
@@ -357,8 +404,6 @@ def load_data(game_filter=None):
                  df['game_id'] = 'jump_assemble'
             else:
                  df['game_id'] = df['game_id'].fillna('jump_assemble')
-                 
-            df = df[df['game_id'] == game_filter]
             
     return df
 
@@ -381,9 +426,6 @@ with st.sidebar:
     menu = st.radio("导航", ["📊 总览大屏", "🧭 评论搜索", "📚 漫画专项", "🦸 英雄专项", "⚙️ 玩法反馈", "📄 分析月报", "🔧 配置管理"], index=0)
     st.markdown("---")
     
-    # Load Data for Sidebar Filters
-    df = load_data(selected_game_key)
-    
     # Date Filter
     st.subheader("📅 时间筛选")
     today = pd.Timestamp.now().date()
@@ -393,27 +435,29 @@ with st.sidebar:
     
     # Source Filter
     st.subheader("🌐 来源筛选")
-    all_sources = sorted(list(df['source'].dropna().unique())) if 'source' in df.columns else []
+    all_sources = load_sources(selected_game_key)
     selected_sources = st.multiselect("选择来源", all_sources, default=all_sources)
     
+    # Rows older than the archive horizon live in per-month archive DBs, read only for ranges that reach them
+    archived = archive_months(start_date, end_date)
+    if archived:
+        st.caption(f"📦 时间范围包含 {len(archived)} 个月的归档数据，加载会稍慢")
+    
     if "taptap_intl" in selected_sources:
         pass
 
     st.markdown("---")
     # Removed Download CSV/XLSX section as requested due to performance lag
 
-# Filter by Source
-if not df.empty and 'source' in df.columns and selected_sources:
-    df = df[df['source'].isin(selected_sources)]
-
-# Apply Date Filter
-if not df.empty and 'review_date' in df.columns:
-    # Convert inputs to datetime
-    s_dt = pd.to_datetime(start_date)
-    e_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1) # End of day
-    
-    mask = (df['review_date'] >= s_dt) & (df['review_date'] <= e_dt)
-    df = df.loc[mask]
+# Load the rows matching the sidebar filters (source filter only when some are selected)
+data_filters = {
+    "game_id": selected_game_key,
+    "start_date": start_date,
+    "end_date": end_date,
+    "sources": tuple(selected_sources) if selected_sources else None
+}
+page_columns = PAGE_COLUMNS.get(menu)
+df = load_data(selected_game_key, start_date, end_date, data_filters["sources"], page_columns) if page_columns else pd.DataFrame()
 
 
 @st.cache_data(ttl=300)
@@ -445,51 +489,31 @@ def load_hero_ip_map(game_key):
     return hero_ip_map, ip_hero_list, hero_display_map
 
 @st.cache_data(ttl=300)
-def process_trends(df, hero_ip_map):
+def process_trends(df, hero_ip_map, filters=None):
     """Process raw reviews into IP and Hero trend data."""
-    if df.empty or 'detailed_analysis' not in df.columns:
+    if df.empty:
         return pd.DataFrame(), pd.DataFrame()
-        
-    ip_records = []
-    hero_records = []
     
-    for _, row in df.iterrows():
-        try:
-            if pd.isna(row['detailed_analysis']): continue
-            data = json.loads(row['detailed_analysis'])
-            heroes = data.get("Heroes", {})
-            
-            review_date = row['review_date']
-            sentiment = row['sentiment_score'] if 'sentiment_score' in row else 0.5
-            
-            # Track IPs mentioned in this review to avoid double counting IP heat per review (optional, but let's count all mentions)
-            # Actually, if a review mentions Goku and Vegeta, it counts twice for Dragon Ball? Usually yes for "Heat".
-            
-            for h_code in heroes.keys():
-                ip_group = hero_ip_map.get(h_code, "Unknown")
-                
-                # Hero Record
-                hero_records.append({
-                    "date": review_date,
-                    "hero": h_code,
-                    "ip": ip_group,
-                    "sentiment": sentiment,
-                    "count": 1
-                })
-                
-                # IP Record
-                if ip_group != "Unknown":
-                    ip_records.append({
-                        "date": review_date,
-                        "ip": ip_group,
-                        "sentiment": sentiment,
-                        "count": 1
-                    })
-                    
-        except:
-            continue
-            
-    return pd.DataFrame(ip_records), pd.DataFrame(hero_records)
+    # One (row, hero) pair per review that mentions the hero, from the mentions table
+    mentions = get_mention_keys_by_row("hero", **(filters or {}))
+    if mentions.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    rows = pd.DataFrame({
+        "id": df['id'],
+        "date": df['review_date'],
+        "sentiment": df['sentiment_score'] if 'sentiment_score' in df.columns else 0.5
+    })
+    # If a review mentions Goku and Vegeta, it counts twice for Dragon Ball ("Heat")
+    hero_df = rows.merge(mentions, left_on='id', right_on='row_id').rename(columns={'key': 'hero'})
+    if hero_df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    hero_df['ip'] = hero_df['hero'].map(lambda h: hero_ip_map.get(h, "Unknown"))
+    hero_df['count'] = 1
+    hero_df = hero_df[["date", "hero", "ip", "sentiment", "count"]]
+    
+    ip_df = hero_df[hero_df['ip'] != "Unknown"][["date", "ip", "sentiment", "count"]].reset_index(drop=True)
+    return ip_df, hero_df
 
 
 if menu == "📊 总览大屏":
@@ -704,26 +728,18 @@ if menu == "📊 总览大屏":
         st.markdown("---")
         st.subheader("📈 核心话题演进趋势")
         
-        if not df.empty and 'detailed_analysis' in df.columns:
+        if not df.empty:
             # 准备数据：提取日期和系统维度
-            topic_trend_data = []
-            for _, row in df.iterrows():
-                if pd.isna(row['detailed_analysis']): continue
-                try:
-                    analysis = json.loads(row['detailed_analysis'])
-                    # Aggregate by day
-                    date = pd.to_datetime(row['review_date']).normalize()
-                    
-                    # 统计系统维度 (Optimization, Network, Matchmaking, Welfare)
-                    system_aspects = analysis.get("System", {})
-                    for aspect, items in system_aspects.items():
-                        if items: # 该评论提到了这个维度
-                            topic_trend_data.append({"date": date, "topic": aspect, "count": 1})
-                except:
-                    continue
+            # 统计系统维度 (Optimization, Network, Matchmaking, Welfare): 每条评论每个维度计 1 次
+            aspect_rows = get_mention_keys_by_row("aspect", **data_filters)
+            topic_trend_data = pd.DataFrame()
+            if not aspect_rows.empty:
+                topic_trend_data = pd.DataFrame({"id": df['id'], "date": pd.to_datetime(df['review_date']).dt.normalize()}) \
+                    .merge(aspect_rows, left_on='id', right_on='row_id').rename(columns={'key': 'topic'})
+                topic_trend_data['count'] = 1
             
-            if topic_trend_data:
-                trend_df = pd.DataFrame(topic_trend_data)
+            if not topic_trend_data.empty:
+                trend_df = topic_trend_data[["date", "topic", "count"]]
                 
                 # Apply date filter
                 s_dt_norm = pd.to_datetime(start_date).normalize()
@@ -1017,7 +1033,7 @@ elif menu == "📚 漫画专项":
     hero_ip_map, ip_hero_list, hero_display_map = load_hero_ip_map(selected_game_key)
     
     # Process Data
-    ip_df, hero_df = process_trends(df, hero_ip_map)
+    ip_df, hero_df = process_trends(df, hero_ip_map, data_filters)
     
     if ip_df.empty:
         st.info("暂无 IP 相关分析数据。请先执行‘深度分析’以提取角色提及。")
@@ -1166,23 +1182,16 @@ elif menu == "🦸 英雄专项":
 
     render_hero("Hero Feedback", "英雄专项反馈")
     
-    if df.empty or 'detailed_analysis' not in df.columns:
+    if df.empty:
         st.info("暂无详细分析数据")
     else:
         # Aggregate Hero Data
         hero_data = {} # {HeroName: {Dim: [items]}}
         
-        for json_str in df['detailed_analysis'].dropna():
-            try:
-                data = json.loads(json_str)
-                heroes = data.get("Heroes", {})
-                for h_name, dims in heroes.items():
-                    if h_name not in hero_data: hero_data[h_name] = {}
-                    for dim, items in dims.items():
-                        if dim not in hero_data[h_name]: hero_data[h_name][dim] = []
-                        hero_data[h_name][dim].extend(items)
-            except:
-                pass
+        for h_name, dim, item in iter_mention_items(df, "hero", data_filters):
+            if h_name not in hero_data: hero_data[h_name] = {}
+            if dim not in hero_data[h_name]: hero_data[h_name][dim] = []
+            hero_data[h_name][dim].append(item)
         
         if not hero_data:
             st.warning("暂无特定英雄的反馈数据。")
@@ -1285,7 +1294,7 @@ elif menu == "🦸 英雄专项":
                     # --- Hero Trend Chart ---
                     # 1. Load Data for Trends
                     hero_ip_map, _, _ = load_hero_ip_map(selected_game_key)
-                    _, hero_trend_df = process_trends(df, hero_ip_map)
+                    _, hero_trend_df = process_trends(df, hero_ip_map, data_filters)
                     
                     if not hero_trend_df.empty:
                         # Aggregation Selector
@@ -1475,7 +1484,7 @@ elif menu == "🦸 英雄专项":
 elif menu == "⚙️ 玩法反馈":
     render_hero("Gameplay & System", "玩法与系统反馈")
     
-    if df.empty or 'detailed_analysis' not in df.columns:
+    if df.empty:
         st.info("暂无数据")
     else:
         sys_data = {}
@@ -1487,24 +1496,13 @@ elif menu == "⚙️ 玩法反馈":
             "礼包码激活方式","我们将基于本轮数据进行整理与优化","玩法规则"
         ]
 
-        for json_str in df['detailed_analysis'].dropna():
-            try:
-                data = json.loads(json_str)
-                system = data.get("System", {})
-                for aspect, items in system.items():
-                    if aspect not in sys_data: sys_data[aspect] = []
-                    
-                    # Filter items
-                    filtered_items = []
-                    for item in items:
-                        text_content = item.get('text', '')
-                        # Check if any official keyword is in the text
-                        if not any(kw in text_content for kw in official_filter_keywords):
-                            filtered_items.append(item)
-                            
-                    sys_data[aspect].extend(filtered_items)
-            except:
-                pass
+        for aspect, _, item in iter_mention_items(df, "aspect", data_filters):
+            if aspect not in sys_data: sys_data[aspect] = []
+            
+            # Filter items: check if any official keyword is in the text
+            text_content = item.get('text', '')
+            if not any(kw in text_content for kw in official_filter_keywords):
+                sys_data[aspect].append(item)
             
         sorted_keys = sorted(sys_data.keys())
         emoji_map = {
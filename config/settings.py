@@ -31,6 +31,11 @@ BAHAMUT_PASS = os.getenv("BAHAMUT_PASS", "")
 DISCORD_USER = os.getenv("DISCORD_USER", "")
 DISCORD_PASS = os.getenv("DISCORD_PASS", "")
 
+# --- Sentiment Backend ---
+# "rules" (SnowNLP + lexicons, default) or "local_llm" (batched llama-server scoring)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "rules")
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8080")
+
 # --- Dynamic Config Loading ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 HEROES_CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'heroes.json')
@@ -3,17 +3,26 @@ import json
 import sqlite3
 import datetime
 import os
+import hashlib
+from collections import OrderedDict
+from functools import partial
 from config.settings import GAMES
-from snownlp import SnowNLP
-import nltk
-from nltk.stem import WordNetLemmatizer
-try:
-    from pythainlp import word_tokenize as thai_tokenize
-    nltk.download('wordnet', quiet=True)
-    lemmatizer = WordNetLemmatizer()
-    HAS_SPECIALIZED = True
-except ImportError:
-    HAS_SPECIALIZED = False
+from core.matcher import KeywordAutomaton
+from core.details import compact_details, mention_rows, DETAILS_VERSION
+from core.lang import detect_language, has_chinese, has_thai, EN, EN_WORD_PATTERN
+from core.sentiment_backends import score_to_label, get_backend
+
+# Heavy NLP stack (SnowNLP, NLTK, pythainlp) is loaded by warm_up() on first use,
+# so importing this module (e.g. from main.py crawl/report) stays cheap
+SnowNLP = None
+lemmatizer = None
+thai_tokenize = None
+HAS_SPECIALIZED = False  # meaningful once warm_up() has run
+_nlp_loaded = False
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLAUSE_CACHE_FILE = os.path.join(BASE_DIR, 'data', 'cache', 'clause_sentiment.jsonl')
+HEROES_CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'heroes.json')
 
 # Specific emotions for Gemini tagging (Schema extension placeholder)
 EMOTION_CHANNELS = ["anger", "disappointment", "expectation", "surprise", "sarcasm", "gratitude"]
@@ -52,81 +61,333 @@ GAME_ASPECTS = {
     "Visuals": ["还原", "還原", "画质", "畫質", "建模", "立绘", "立繪", "特效", "ui", "界面", "graphic", "visual", "art", "design", "model"]
 }
 
-def analyze_sentiment(text):
+# --- Sentiment Lexicons ---
+OFFICIAL_PHRASES = ["頻道守則", "意見回饋", "營運團隊", "勾选建议类别", "勾選建議類別", "遵守【頻道守則】"]
+
+POS_WORDS = ["好", "赞", "贊", "强", "強", "不错", "不錯", "神", "神作", "优秀", "还原", "流畅", "良心", "爽", "喜欢", "期待", "好用", "还原度", "精美", "丝滑"]
+NEG_WORDS = [
+    "烂", "爛", "差", "负面", "失望", "废", "难", "坑", "垃圾", "卡", "慢", "贵", "恶心", "辣鸡", "丑", "弱", "削", "砍", 
+    "不听话", "贵得要死", "贵死", "吃相难看", "离谱", "滚", "没诚意", "割韭菜",
+    "一坨", "稀碎", "稀烂", "拉胯", "拉垮", "不好", "不行", "僵硬", "笨重", "拉稀", "毁", "崩", "劝退",
+    "傻逼", "SB", "脑残", "孤儿", "寄了", "凉了", "卸载", "删游戏", "退钱", "骗氪", "暗改", "差评", "给一星",
+    "垃圾平衡", "平衡烂", "匹配烂", "人机多", "恶性bug", "滚出", "糟蹋", "毁原作", "没救了", "玩你妈",
+    "傻X", "sb", "垃圾公司", "避雷", "快逃", "千万别玩", "浪费时间", "什么玩意", "玩不下去"
+]
+
+# Strong negatives that should heavily weight the score
+STRONG_NEGATIVES = [
+    "贵得要死", "太贵", "吃相难看", "垃圾", "烂", "烂作", "割韭菜", "稀烂", "稀碎", "一坨", "狗屎", "答辩",
+    "傻逼", "SB", "脑残", "给一星", "退钱", "孤儿", "玩你妈", "垃圾公司", "喂屎", "差到极致", "千万别玩"
+]
+
+# Don't count "好" if any of these is present
+HAO_EXCEPTIONS = ["不好", "不太好", "不怎么好", "好卡", "好难"]
+
+# English fallback (matched against lowercased text when there is no Chinese)
+EN_POS_WORDS = ["good", "great", "nice", "love", "awesome", "amazing", "fun", "best", "buff", "strong"]
+EN_NEG_WORDS = ["bad", "worst", "hate", "trash", "rubbish", "boring", "toxic", "laggy", "expensive", "nerf", "weak"]
+
+def _build_weights(*weighted_lists):
+    """
+    Map each word to its (order, delta) contributions. The order index lets the
+    matcher re-apply deltas in the original list order so float sums are identical
+    to the old sequential loops.
+    """
+    weights = {}
+    order = 0
+    for words, delta in weighted_lists:
+        for w in words:
+            weights.setdefault(w, []).append((order, delta))
+            order += 1
+    return weights
+
+_ZH_WEIGHTS = _build_weights((POS_WORDS, 0.15), (NEG_WORDS, -0.15), (STRONG_NEGATIVES, -0.25))
+_EN_WEIGHTS = _build_weights((EN_POS_WORDS, 0.1), (EN_NEG_WORDS, -0.1))
+_OFFICIAL_SET = set(OFFICIAL_PHRASES)
+_HAO_EXCEPTION_SET = set(HAO_EXCEPTIONS)
+
+# One automaton for everything matched on the raw text, one for the lowercased English pass
+_LEXICON_AUTOMATON = KeywordAutomaton(OFFICIAL_PHRASES + HAO_EXCEPTIONS + list(_ZH_WEIGHTS))
+_EN_AUTOMATON = KeywordAutomaton(list(_EN_WEIGHTS))
+
+def _apply_weights(score, hits, weights, skip=()):
+    deltas = []
+    for w in hits:
+        if w in skip: continue
+        deltas.extend(weights.get(w, ()))
+    for _, delta in sorted(deltas):
+        score += delta
+    return score
+
+def _build_tag_map(**groups):
+    # keyword -> [(kind, name)], e.g. "画质" -> [("aspect", "Optimization"), ("aspect", "Visuals"), ("dimension", "Visual")]
+    tag_map = {}
+    for kind, group in groups.items():
+        for name, keywords in group.items():
+            for k in keywords:
+                tag_map.setdefault(k, []).append((kind, name))
+    return tag_map
+
+# Aspect, hero-dimension and mode keywords in one automaton, matched once per lowercased clause.
+# Like the old `k in clause.lower()` checks, upper-case keywords ("CD", "PVP") never match.
+_TAG_MAP = _build_tag_map(aspect=GAME_ASPECTS, dimension=HERO_DIMENSIONS, mode=GAME_MODES)
+_TAG_AUTOMATON = KeywordAutomaton(list(_TAG_MAP))
+
+def match_clause_tags(lower_clause):
+    """
+    Returns (aspects, dimension, modes) for a lowercased clause:
+    aspects in GAME_ASPECTS order, the first matching HERO_DIMENSIONS key (or None)
+    and the GAME_MODES tags in declaration order.
+    """
+    found = {"aspect": set(), "dimension": set(), "mode": set()}
+    for k in _TAG_AUTOMATON.findall(lower_clause):
+        for kind, name in _TAG_MAP[k]:
+            found[kind].add(name)
+    aspects = [a for a in GAME_ASPECTS if a in found["aspect"]]
+    dimension = next((d for d in HERO_DIMENSIONS if d in found["dimension"]), None)
+    modes = [m for m in GAME_MODES if m in found["mode"]]
+    return aspects, dimension, modes
+
+def analyze_sentiment(text, lang=None):
+    """lang: detect_language(text) if the caller already has it."""
     if not text or not text.strip():
         return 0.5, "Neutral"
 
+    hits = _LEXICON_AUTOMATON.findall(text)
+
     # 0. Official Pattern Detection (Forced Neutral)
-    official_phrases = ["頻道守則", "意見回饋", "營運團隊", "勾选建议类别", "勾選建議類別", "遵守【頻道守則】"]
-    if any(phrase in text for phrase in official_phrases):
+    if not hits.isdisjoint(_OFFICIAL_SET):
         return 0.5, "Neutral"
 
+    is_chinese = has_chinese(lang or detect_language(text))
+    if is_chinese and not _nlp_loaded:
+        warm_up()
+
     # 1. Start with SnowNLP for Chinese content
     score = 0.5
     try:
-        if re.search(r'[\u4e00-\u9fa5]', text):
+        if is_chinese:
             score = SnowNLP(text).sentiments
     except:
         pass
 
     # 2. Apply rule-based bias for game-specific sentiment (More sensitive)
-    pos_words = ["好", "赞", "贊", "强", "強", "不错", "不錯", "神", "神作", "优秀", "还原", "流畅", "良心", "爽", "喜欢", "期待", "好用", "还原度", "精美", "丝滑"]
-    neg_words = [
-        "烂", "爛", "差", "负面", "失望", "废", "难", "坑", "垃圾", "卡", "慢", "贵", "恶心", "辣鸡", "丑", "弱", "削", "砍", 
-        "不听话", "贵得要死", "贵死", "吃相难看", "离谱", "滚", "没诚意", "割韭菜",
-        "一坨", "稀碎", "稀烂", "拉胯", "拉垮", "不好", "不行", "僵硬", "笨重", "拉稀", "毁", "崩", "劝退",
-        "傻逼", "SB", "脑残", "孤儿", "寄了", "凉了", "卸载", "删游戏", "退钱", "骗氪", "暗改", "差评", "给一星",
-        "垃圾平衡", "平衡烂", "匹配烂", "人机多", "恶性bug", "滚出", "糟蹋", "毁原作", "没救了", "玩你妈",
-        "傻X", "sb", "垃圾公司", "避雷", "快逃", "千万别玩", "浪费时间", "什么玩意", "玩不下去"
-    ]
-    
-    # Strong negatives that should heavily weight the score
-    strong_negatives = [
-        "贵得要死", "太贵", "吃相难看", "垃圾", "烂", "烂作", "割韭菜", "稀烂", "稀碎", "一坨", "狗屎", "答辩",
-        "傻逼", "SB", "脑残", "给一星", "退钱", "孤儿", "玩你妈", "垃圾公司", "喂屎", "差到极致", "千万别玩"
-    ]
-    
-    for w in pos_words:
-        # Special handling: Don't count "好" if "不好" or "不怎么好" or "不太好" is present
-        if w == "好" and any(neg in text for neg in ["不好", "不太好", "不怎么好", "好卡", "好难"]):
-            continue
-        if w in text: score += 0.15
-    for w in neg_words:
-        if w in text: score -= 0.15
-    for w in strong_negatives:
-        if w in text: score -= 0.25 # Additional penalty
+    # Special handling: Don't count "好" if "不好" or "不怎么好" or "不太好" is present
+    skip = ("好",) if not hits.isdisjoint(_HAO_EXCEPTION_SET) else ()
+    score = _apply_weights(score, hits, _ZH_WEIGHTS, skip)
     
     # 3. Handle English Rule-based if no Chinese
-    if not re.search(r'[\u4e00-\u9fa5]', text):
-        en_pos = ["good", "great", "nice", "love", "awesome", "amazing", "fun", "best", "buff", "strong"]
-        en_neg = ["bad", "worst", "hate", "trash", "rubbish", "boring", "toxic", "laggy", "expensive", "nerf", "weak"]
-        for w in en_pos:
-            if w in text.lower(): score += 0.1
-        for w in en_neg:
-            if w in text.lower(): score -= 0.1
+    if not is_chinese:
+        score = _apply_weights(score, _EN_AUTOMATON.findall(text.lower()), _EN_WEIGHTS)
 
     score = max(0.0, min(1.0, score))
     
     # 4. Standard Labels (Clearer thresholds)
-    if score > 0.51:
-        label = "Positive"
-    elif score < 0.49:
-        label = "Negative"
+    return round(score, 3), score_to_label(score)
+
+# Bump when the analysis logic itself changes (not just keyword lists), so
+# `main.py analyze --stale` re-runs every row
+ANALYZER_VERSION = 1
+
+# Changes whenever the rule lexicons change, so persisted clause scores never go stale
+LEXICON_FINGERPRINT = hashlib.md5(json.dumps(
+    [OFFICIAL_PHRASES, POS_WORDS, NEG_WORDS, STRONG_NEGATIVES, HAO_EXCEPTIONS, EN_POS_WORDS, EN_NEG_WORDS],
+    ensure_ascii=False
+).encode('utf-8')).hexdigest()[:12]
+
+class ClauseSentimentCache:
+    """
+    Bounded LRU of clause -> (score, label), keyed by the md5 of the clause text.
+    Chats and comments repeat short clauses ("卡", "垃圾", "好玩") constantly,
+    so this skips SnowNLP for everything seen before in the run (or on disk).
+    Only clauses go through it; whole documents are mostly unique and would
+    push the reusable entries out.
+    readonly: never saved to disk; new scores are collected for drain() instead
+    (pool workers, whose parent merges them into its own cache).
+    """
+    def __init__(self, maxsize=50000, path=None, readonly=False):
+        self.maxsize = maxsize
+        self.path = path
+        self.readonly = readonly
+        self.hits = 0
+        self.misses = 0
+        self.new_entries = []
+        self._data = OrderedDict()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    def score(self, text, lang=None):
+        key = self._key(text)
+        cached = self._data.get(key)
+        if cached is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        result = analyze_sentiment(text, lang)
+        self._data[key] = result
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        if self.readonly:
+            self.new_entries.append((key, result))
+        return result
+
+    def drain(self):
+        """(new entries, hits, misses) since the last drain, then reset them."""
+        drained = (self.new_entries, self.hits, self.misses)
+        self.new_entries, self.hits, self.misses = [], 0, 0
+        return drained
+
+    def merge(self, drained):
+        """Add what a worker's cache drained (its scores become most recently used here)."""
+        entries, hits, misses = drained
+        self.hits += hits
+        self.misses += misses
+        for key, result in entries:
+            self._data[key] = result
+            self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry.get('fp') != LEXICON_FINGERPRINT: continue
+                    self._data[entry['hash']] = (entry['score'], entry['label'])
+                except: continue
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return len(self._data)
+
+    def save(self):
+        if not self.path or self.readonly:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, (score, label) in self._data.items():
+                f.write(json.dumps({"hash": key, "score": score, "label": label, "fp": LEXICON_FINGERPRINT}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return f"{self.hits} hits / {self.misses} misses ({rate:.1f}% hit rate, {len(self._data)} cached)"
+
+# Active cache for the current process_reviews/process_chats run (None outside a run)
+_clause_cache = None
+
+def start_clause_cache(persist=True, maxsize=50000, readonly=False):
+    global _clause_cache, _token_cache
+    _clause_cache = ClauseSentimentCache(maxsize=maxsize, path=CLAUSE_CACHE_FILE if persist else None, readonly=readonly)
+    _token_cache = OrderedDict()
+    loaded = _clause_cache.load()
+    if loaded and not readonly:
+        print(f"Loaded {loaded} cached clause scores.")
+    return _clause_cache
+
+def finish_clause_cache():
+    global _clause_cache, _token_cache
+    _token_cache = None
+    if _clause_cache is None:
+        return
+    print(f"Clause cache: {_clause_cache.stats()}")
+    try:
+        _clause_cache.save()
+    except Exception as e:
+        print(f"Error saving clause cache: {e}")
+    _clause_cache = None
+
+# Keyword sets for the tokenizer paths, built once by warm_up() instead of per clause and aspect
+_THAI_ASPECT_KEYWORDS = {}
+_EN_ASPECT_LEMMAS = {}
+
+def warm_up():
+    """
+    Load the NLP stack now: SnowNLP, and NLTK's WordNet lemmatizer plus pythainlp
+    when both are installed (HAS_SPECIALIZED). Called automatically on first use;
+    call it up front to pay the import/download cost before a run, e.g. before
+    forking analysis workers. Returns HAS_SPECIALIZED.
+    """
+    global SnowNLP, lemmatizer, thai_tokenize, HAS_SPECIALIZED, _THAI_ASPECT_KEYWORDS, _EN_ASPECT_LEMMAS, _nlp_loaded
+    if _nlp_loaded:
+        return HAS_SPECIALIZED
+
+    from snownlp import SnowNLP as _SnowNLP
+    SnowNLP = _SnowNLP
+    try:
+        import nltk
+        from nltk.stem import WordNetLemmatizer
+        from pythainlp import word_tokenize
+        nltk.download('wordnet', quiet=True)
+        lemmatizer = WordNetLemmatizer()
+        thai_tokenize = word_tokenize
+        _THAI_ASPECT_KEYWORDS = {aspect: set(keywords) for aspect, keywords in GAME_ASPECTS.items()}
+        _EN_ASPECT_LEMMAS = {aspect: {lemmatizer.lemmatize(k.lower()) for k in keywords} for aspect, keywords in GAME_ASPECTS.items()}
+        HAS_SPECIALIZED = True
+    except ImportError:
+        HAS_SPECIALIZED = False
+    _nlp_loaded = True
+    return HAS_SPECIALIZED
+
+# clause -> GAME_ASPECTS hits from the Thai/English tokenizer paths, an LRU kept for one run
+_token_cache = None
+TOKEN_CACHE_SIZE = 50000
+
+def token_aspects(clause, clause_lang):
+    """
+    Aspects of a clause via pythainlp tokens (Thai) or NLTK lemmas (non-Chinese),
+    or None when the clause takes the plain keyword path. The clause is tokenized
+    once, and during an analysis run repeated clauses are not tokenized again.
+    """
+    if not _nlp_loaded:
+        warm_up()
+    if not HAS_SPECIALIZED:
+        return None
+    if has_thai(clause_lang):
+        kind, keyword_sets = "th", _THAI_ASPECT_KEYWORDS
+    elif not has_chinese(clause_lang):
+        kind, keyword_sets = "en", _EN_ASPECT_LEMMAS
     else:
-        label = "Neutral"
-        
-    return round(score, 3), label
+        return None
 
-def load_hero_map(game_id):
+    key = (kind, clause)
+    if _token_cache is not None and key in _token_cache:
+        _token_cache.move_to_end(key)
+        return _token_cache[key]
+
+    if kind == "th":
+        tokens = set(thai_tokenize(clause, engine="newmm"))
+    else:
+        tokens = {lemmatizer.lemmatize(w.lower()) for w in EN_WORD_PATTERN.findall(clause)}
+    aspects = [aspect for aspect, keywords in keyword_sets.items() if not keywords.isdisjoint(tokens)]
+
+    if _token_cache is not None:
+        _token_cache[key] = aspects
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return aspects
+
+def score_clause(text, lang=None):
+    """analyze_sentiment, memoized through the active run cache if there is one."""
+    if _clause_cache is not None:
+        return _clause_cache.score(text, lang)
+    return analyze_sentiment(text, lang)
+
+def _parse_hero_map(game_id):
     # Flatten: Groups -> Series -> Hero -> Aliases
     # Returns {alias: hero_code}
     hero_map = {}
     try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        heroes_path = os.path.join(base_dir, 'config', 'heroes.json')
-        
-        if os.path.exists(heroes_path):
-            with open(heroes_path, 'r', encoding='utf-8') as f:
+        if os.path.exists(HEROES_CONFIG_PATH):
+            with open(HEROES_CONFIG_PATH, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 game_data = data.get(game_id, {})
                 groups = game_data.get('Groups', {})
@@ -139,159 +400,405 @@ def load_hero_map(game_id):
         
     return hero_map
 
-def detailed_aspect_analysis(text, game_id="jump_assemble", metadata=None):
+class HeroIndex:
+    """Compiled alias lookup for one game: alias map plus an alias automaton."""
+    def __init__(self, hero_map):
+        self.hero_map = hero_map
+        # Stored per analyzed row; a mismatch means only hero attribution is out of date
+        self.fingerprint = hashlib.md5(
+            json.dumps(list(hero_map.items()), ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        self.automaton = KeywordAutomaton(hero_map.keys())
+        # Alias position in the config, used to keep hero order stable
+        self.alias_rank = {alias: i for i, alias in enumerate(hero_map)}
+
+    def find_heroes(self, lower_clause):
+        """
+        Hero codes mentioned in an already-lowercased clause, in one pass.
+        An alias nested inside a longer matched alias is skipped, so "孙悟空（超一）"
+        does not also tag the "悟空" inside it; partly overlapping aliases both count.
+        """
+        aliases = set(self.automaton.find_outermost(lower_clause))
+        found = []
+        for alias in sorted(aliases, key=self.alias_rank.__getitem__):
+            h_code = self.hero_map[alias]
+            if h_code not in found:
+                found.append(h_code)
+        return found
+
+# game_id -> (heroes.json stat signature, HeroIndex)
+_hero_index_cache = {}
+
+def get_hero_index(game_id):
     """
-    metadata: optional dict containing 'source', 'date', 'full_content'
+    Process-wide compiled hero index for a game. heroes.json is only re-parsed
+    when its mtime/size changes, so edits saved from the web UI still take
+    effect without restarting.
     """
-    analysis = {"Heroes": {}, "System": {}}
-    
-    # Use the new robust loader
-    hero_map = load_hero_map(game_id)
-    
+    try:
+        st = os.stat(HEROES_CONFIG_PATH)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+
+    cached = _hero_index_cache.get(game_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    index = HeroIndex(_parse_hero_map(game_id))
+    _hero_index_cache[game_id] = (signature, index)
+    return index
+
+def load_hero_map(game_id):
+    return get_hero_index(game_id).hero_map
+
+def split_clauses(text):
     clauses = re.split(r'[，。！？;；\n,.!?]', text)
-    clauses = [c.strip() for c in clauses if c.strip()]
-    
+    return [c.strip() for c in clauses if c.strip()]
+
+def _attribute_heroes(clauses, hero_index, clause_scores, clause_dims):
+    """
+    Hero step of detailed_aspect_analysis: a clause naming a hero sets the context,
+    and every clause in that context is filed under the hero's matching dimension.
+    """
+    heroes = {}
     current_hero_context = None
-    
     for clause in clauses:
-        found_heroes_in_clause = []
-        lower_clause = clause.lower()
-        for h_alias, h_code in hero_map.items():
-            if h_alias in lower_clause:
-                if h_code not in found_heroes_in_clause:
-                    found_heroes_in_clause.append(h_code)
+        found_heroes_in_clause = hero_index.find_heroes(clause.lower())
         
         if found_heroes_in_clause:
             current_hero_context = found_heroes_in_clause
-            
-        score, label = analyze_sentiment(clause)
         
-        # 1. Hero Analysis
         if current_hero_context:
+            score, label = clause_scores[clause]
+            dim = clause_dims[clause] or "General"
             for hero_code in current_hero_context:
-                matched_dim = False
-                for dim, kw_list in HERO_DIMENSIONS.items():
-                    if any(k in clause.lower() for k in kw_list):
-                        if hero_code not in analysis["Heroes"]:
-                            analysis["Heroes"][hero_code] = {}
-                        if dim not in analysis["Heroes"][hero_code]:
-                            analysis["Heroes"][hero_code][dim] = []
-                        analysis["Heroes"][hero_code][dim].append({
-                            "text": clause, 
-                            "label": label, 
-                            "score": score,
-                            "metadata": metadata
-                        })
-                        matched_dim = True
-                        break
-                
-                if not matched_dim:
-                    if hero_code not in analysis["Heroes"]:
-                        analysis["Heroes"][hero_code] = {}
-                    if "General" not in analysis["Heroes"][hero_code]:
-                        analysis["Heroes"][hero_code]["General"] = []
-                    analysis["Heroes"][hero_code]["General"].append({
-                        "text": clause, 
-                        "label": label, 
-                        "score": score,
-                        "metadata": metadata
-                    })
-
-    # 2. System Aspect Analysis (Iterate clauses again vs Aspects)
-    for aspect, keywords in GAME_ASPECTS.items():
-        for clause in clauses:
-            match_found = False
-            # Smart matching
-            if re.search(r'[\u0E00-\u0E7F]', clause) and HAS_SPECIALIZED:
-                tokens = thai_tokenize(clause, engine="newmm")
-                if any(k in tokens for k in keywords): match_found = True
-            elif not re.search(r'[\u4e00-\u9fa5]', clause) and HAS_SPECIALIZED:
-                tokens = [lemmatizer.lemmatize(w.lower()) for w in re.findall(r'\b[a-z]{2,}\b', clause)]
-                if any(lemmatizer.lemmatize(k.lower()) in tokens for k in keywords): match_found = True
-            else:
-                if any(k in clause.lower() for k in keywords): match_found = True
-
-            if match_found:
-                 score, label = analyze_sentiment(clause) 
-                 if aspect not in analysis["System"]:
-                     analysis["System"][aspect] = []
-                 
-                 tags = []
-                 for mode, mode_keywords in GAME_MODES.items():
-                     if any(mk in clause.lower() for mk in mode_keywords):
-                         tags.append(mode)
-                         
-                 analysis["System"][aspect].append({
-                     "text": clause, 
-                     "label": label, 
-                     "score": score, 
-                     "tags": tags,
-                     "metadata": metadata
-                 })
+                if hero_code not in heroes:
+                    heroes[hero_code] = {}
+                if dim not in heroes[hero_code]:
+                    heroes[hero_code][dim] = []
+                heroes[hero_code][dim].append({
+                    "text": clause, 
+                    "label": label, 
+                    "score": score
+                })
+    return heroes
+
+def detailed_aspect_analysis(text, game_id="jump_assemble", lang=None):
+    """
+    Returns the compact (v2) detailed_analysis JSON: items carry only clause
+    text/label/score(/tags); readers restore the review context from the row
+    via core.details.load_details.
+    lang: detect_language(text) if the caller already has it
+    """
+    return json.dumps(aspect_analysis(text, game_id, lang), ensure_ascii=False)
+
+def aspect_analysis(text, game_id="jump_assemble", lang=None):
+    """detailed_aspect_analysis as a dict (before JSON encoding)."""
+    hero_index = get_hero_index(game_id)
+    
+    clauses = split_clauses(text)
+    
+    clause_scores = {}
+    # Script of each clause, detected once and shared by scoring and aspect matching.
+    # A text with no Chinese/Thai at all can't have clauses that do.
+    doc_is_en = (lang or detect_language(text)) == EN
+    clause_langs = {}
+    clause_tags = {}
+    
+    for clause in clauses:
+        if clause not in clause_scores:
+            clause_langs[clause] = EN if doc_is_en else detect_language(clause)
+            clause_scores[clause] = score_clause(clause, clause_langs[clause])
+            clause_tags[clause] = match_clause_tags(clause.lower())
+    
+    # 1. Hero Analysis
+    clause_dims = {clause: tags[1] for clause, tags in clause_tags.items()}
+    analysis = {"v": DETAILS_VERSION, "Heroes": _attribute_heroes(clauses, hero_index, clause_scores, clause_dims), "System": {}}
+
+    # 2. System Aspect Analysis (one pass over clauses, grouped per aspect in GAME_ASPECTS order)
+    system_hits = {aspect: [] for aspect in GAME_ASPECTS}
+    for clause in clauses:
+        aspects, _, modes = clause_tags[clause]
+        # Smart matching: tokenizer paths for Thai/English, keyword automaton otherwise
+        token_hits = token_aspects(clause, clause_langs[clause])
+        if token_hits is not None:
+            aspects = token_hits
+
+        score, label = clause_scores[clause]
+        for aspect in aspects:
+            system_hits[aspect].append({
+                "text": clause, 
+                "label": label, 
+                "score": score, 
+                "tags": list(modes)
+            })
+
+    for aspect, items in system_hits.items():
+        if items:
+            analysis["System"][aspect] = items
                  
-    return json.dumps(analysis, ensure_ascii=False)
+    return analysis
+
+def refresh_hero_attribution(text, details_json, game_id="jump_assemble"):
+    """
+    Re-run only the hero step of an existing detailed_analysis (heroes.json changed,
+    nothing else did). Clause scores are reused from the stored items; clauses that
+    were never stored (no hero or aspect hit before) go through score_clause.
+    Returns the refreshed analysis dict (legacy v1 input comes back compact),
+    or None when the stored JSON can't be reused.
+    """
+    try:
+        analysis = json.loads(details_json)
+    except Exception:
+        return None
+    if not isinstance(analysis, dict) or "System" not in analysis:
+        return None
+
+    clause_scores = {}
+    for dims in analysis.get("Heroes", {}).values():
+        for items in dims.values():
+            for item in items:
+                clause_scores[item["text"]] = (item["score"], item["label"])
+    for items in analysis["System"].values():
+        for item in items:
+            clause_scores[item["text"]] = (item["score"], item["label"])
+
+    clauses = split_clauses(text)
+    clause_dims = {}
+    for clause in clauses:
+        if clause not in clause_dims:
+            clause_dims[clause] = match_clause_tags(clause.lower())[1]
+            if clause not in clause_scores:
+                clause_scores[clause] = score_clause(clause)
+
+    analysis["Heroes"] = _attribute_heroes(clauses, get_hero_index(game_id), clause_scores, clause_dims)
+    return compact_details(analysis)
+
+def current_analyzer_version():
+    """
+    ANALYZER_VERSION plus a hash of everything except heroes.json that shapes a
+    row's stored analysis: lexicons, aspect/dimension/mode keywords, the sentiment
+    backend and whether the Thai/English tokenizers are installed.
+    """
+    config = json.dumps(
+        [LEXICON_FINGERPRINT, GAME_ASPECTS, HERO_DIMENSIONS, GAME_MODES, get_backend().name, warm_up()],
+        ensure_ascii=False
+    )
+    return f"{ANALYZER_VERSION}-{hashlib.md5(config.encode('utf-8')).hexdigest()[:10]}"
+
+def _row_game_id(gid, game_id):
+    return gid if gid else (game_id if game_id else "jump_assemble")
+
+def _analysis_result(rid, score, label, analysis, gid, source, date, version=None):
+    """
+    The (id, score, label, character_mentions, detailed_analysis, analyzer_version,
+    hero_fingerprint, mention_rows) tuple the core.db batch writers store.
+    version: current_analyzer_version(), computed once per run by the caller.
+    """
+    # Extract identified heroes
+    heroes_found = list(analysis.get("Heroes", {}).keys())
+    return (rid, score, label, ",".join(heroes_found) if heroes_found else None,
+            json.dumps(analysis, ensure_ascii=False),
+            version or current_analyzer_version(), get_hero_index(gid).fingerprint,
+            mention_rows(rid, analysis, date, source, gid))
+
+def analyze_review_row(row, game_id=None, doc_score=None, version=None):
+    """
+    Analyze one (id, content, game_id, source, date) review row.
+    doc_score: optional (score, label) already computed by a batched backend.
+    version: the run's current_analyzer_version() (computed here if omitted).
+    Returns the _analysis_result tuple to store, or None if the row has no content.
+    """
+    rid, content, gid, source, date = row[:5]
+    if not content: return None
+    
+    gid = _row_game_id(gid, game_id)
+    lang = detect_language(content)
+    score, label = doc_score or analyze_sentiment(content, lang)
+    analysis = aspect_analysis(content, gid, lang=lang)
+    return _analysis_result(rid, score, label, analysis, gid, source, date, version)
+
+def analyze_chat_row(row, game_id=None, doc_score=None, version=None):
+    """Same as analyze_review_row, with the chat-specific bot/command filtering."""
+    mid, content, gid, source, date = row[:5]
+    if not content: return None
+    
+    gid = _row_game_id(gid, game_id)
+    # Additional cleaning for chats (commands, stickers)
+    if _is_bot_chat(content):
+        # Mark as Neutral and skip heavy analysis
+        return _analysis_result(mid, 0.5, "Neutral", {}, gid, source, date, version)
+
+    lang = detect_language(content)
+    score, label = doc_score or analyze_sentiment(content, lang)
+    analysis = aspect_analysis(content, gid, lang=lang)
+    return _analysis_result(mid, score, label, analysis, gid, source, date, version)
 
-def process_reviews(game_id=None, force=False):
-    from core.db import init_db, get_reviews_for_analysis, update_analysis_results
+def _is_bot_chat(content):
+    return "使用export" in content or "🤖" in content
+
+def refresh_heroes_row(row, game_id=None, doc_score=None, version=None, full_analyze_fn=analyze_review_row):
+    """
+    Hero-only re-analysis of a (id, content, game_id, source, date, score, label,
+    detailed_analysis) row whose analyzer version is current. Keeps the stored
+    sentiment; falls back to full_analyze_fn (the table's own analyzer) if the
+    stored JSON is unusable.
+    """
+    rid, content, gid, source, date, score, label, details_json = row
+    if not content: return None
+    
+    gid = _row_game_id(gid, game_id)
+    if details_json == "{}" and _is_bot_chat(content):
+        analysis = {}
+    else:
+        analysis = refresh_hero_attribution(content, details_json or "", gid)
+        if analysis is None:
+            return full_analyze_fn(row, game_id, version=version)
+    return _analysis_result(rid, score, label, analysis, gid, source, date, version)
+
+def _init_worker():
+    # Each worker keeps its own clause cache, seeded from disk; its new scores go
+    # back to the parent with each result (see _analyze_in_worker)
+    warm_up()
+    start_clause_cache(readonly=True)
+
+def _open_pool(workers):
+    if workers <= 1:
+        return None
+    import multiprocessing
+    return multiprocessing.Pool(workers, initializer=_init_worker)
+
+def _analyze_scored_row(args):
+    analyze_fn, row, game_id, doc_score, version = args
+    return analyze_fn(row, game_id, doc_score, version)
+
+def _analyze_in_worker(args):
+    return _analyze_scored_row(args), _clause_cache.drain()
+
+def _analyze_rows(rows, analyze_fn, game_id, pool=None, workers=1, backend=None, version=None):
+    """
+    Analyze one chunk of rows, keeping input order. A batched backend scores the
+    whole chunk up front (many texts per request); clause-level scoring stays on
+    the rules engine. With a pool the rows are sharded across worker processes;
+    imap preserves order, so the writes are identical to the serial path.
+    """
+    hero_only = getattr(analyze_fn, "func", analyze_fn) is refresh_heroes_row
+    if backend is not None and backend.batched and not hero_only:
+        doc_scores = backend.score_batch([r[1] or "" for r in rows])
+    else:
+        doc_scores = [None] * len(rows)
+    version = version or current_analyzer_version()
+    tasks = [(analyze_fn, r, game_id, d, version) for r, d in zip(rows, doc_scores)]
+
+    if pool is None:
+        results = [_analyze_scored_row(t) for t in tasks]
+    else:
+        chunksize = max(1, len(rows) // (workers * 4))
+        results = []
+        for result, drained in pool.imap(_analyze_in_worker, tasks, chunksize=chunksize):
+            if _clause_cache is not None:
+                _clause_cache.merge(drained)  # so the parent saves the workers' scores
+            results.append(result)
+    return [r for r in results if r]
+
+def _run_analysis(kind, table, db_path, analyze_fn, iter_fn, count_fn,
+                  game_id=None, force=False, workers=1, chunk_size=500, stale=None):
+    """
+    Streaming pipeline: read a keyset-paginated chunk, analyze it, hand the
+    results to an AnalysisResultSink (which commits them with their mentions and
+    the checkpoint every few chunks), repeat. A --force run that dies halfway
+    resumes after the last committed id; normal and --stale runs resume naturally
+    because finished rows no longer match the selection.
+    stale: optional row selection from _stale_selection (see core.db._analysis_conditions)
+    """
+    from core.db import get_checkpoint, clear_checkpoint, AnalysisResultSink
+    job = f"{table}:{game_id or '*'}:force" if force and not stale else None
+    after_id = get_checkpoint(db_path, job) if job else None
+
+    total = count_fn(game_id, force, after_id, stale=stale)
+    if not total:
+        if job and after_id: clear_checkpoint(db_path, job)
+        if not stale: print(f"No new {kind} to analyze.")
+        return False
+    if after_id:
+        print(f"Resuming interrupted run after id {after_id}...")
+    print(f"Analyzing {total} {kind}" + (f" with {workers} workers..." if workers > 1 else "..."))
+
+    # Load the NLP stack once here, so forked workers inherit it
+    warm_up()
+    backend = get_backend()
+    version = current_analyzer_version()  # hashes every keyword table, so once per run
+    if backend.batched:
+        print(f"Using '{backend.name}' sentiment backend for row-level scores.")
+    pool = _open_pool(workers)
+    start_clause_cache()
+    done = 0
+    try:
+        with AnalysisResultSink(db_path, table, job) as sink:
+            for chunk in iter_fn(game_id, force, chunk_size, after_id, stale=stale):
+                sink.add(_analyze_rows(chunk, analyze_fn, game_id, pool, workers, backend, version), chunk[-1][0])
+                done += len(chunk)
+                print(f"  ... {done}/{total} {kind}")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        finish_clause_cache()
+
+    if job:
+        clear_checkpoint(db_path, job)
+    return True
+
+def _stale_selection(db_path, table, game_id, hero_only=False):
+    """
+    Row selection for --stale runs. The full pass picks rows whose analyzer version
+    is missing or outdated; the hero-only pass picks current-version rows whose
+    heroes.json fingerprint differs from their game's current one.
+    """
+    stale = {"version": current_analyzer_version()}
+    if hero_only:
+        from core.db import get_analysis_game_ids
+        default_game = _row_game_id(None, game_id)
+        games = {_row_game_id(gid, game_id) for gid in get_analysis_game_ids(db_path, table)}
+        stale["default_game"] = default_game
+        stale["hero_fingerprints"] = {g: get_hero_index(g).fingerprint for g in games}
+    return stale
+
+def _process_table(kind, table, db_path, analyze_fn, iter_fn, count_fn,
+                   game_id, force, workers, chunk_size, stale):
+    if not stale:
+        return _run_analysis(kind, table, db_path, analyze_fn, iter_fn, count_fn,
+                             game_id, force, workers, chunk_size)
+
+    # 1. Analyzer/config changed (or never analyzed): full re-analysis
+    full = _run_analysis(kind, table, db_path, analyze_fn, iter_fn, count_fn,
+                         game_id, False, workers, chunk_size, stale=_stale_selection(db_path, table, game_id))
+    # 2. Only heroes.json changed: redo hero attribution, keep stored sentiment
+    refresh_fn = partial(refresh_heroes_row, full_analyze_fn=analyze_fn)
+    heroes = _run_analysis(f"{kind} (hero attribution only)", table, db_path, refresh_fn,
+                           iter_fn, count_fn, game_id, False, workers, chunk_size,
+                           stale=_stale_selection(db_path, table, game_id, hero_only=True))
+    if not (full or heroes):
+        print(f"All {kind} are up to date.")
+    return full or heroes
+
+def process_reviews(game_id=None, force=False, workers=1, chunk_size=500, stale=False):
+    from core.db import init_db, DB_NAME, iter_reviews_for_analysis, count_reviews_for_analysis
     init_db() 
-    rows = get_reviews_for_analysis(game_id, force)
-    if not rows:
-        print("No new reviews to analyze.")
-        return
-    print(f"Analyzing {len(rows)} reviews...")
-    for r in rows:
-        rid, content, gid, source, date = r
-        if not content: continue
-        current_gid = gid if gid else (game_id if game_id else "jump_assemble")
-        
-        metadata = {"source": source, "date": date, "full_content": content}
-        score, label = analyze_sentiment(content)
-        details_json = detailed_aspect_analysis(content, current_gid, metadata=metadata)
-        
-        # Extract identified heroes
-        char_mentions_str = None
-        try:
-            details = json.loads(details_json)
-            heroes_found = list(details.get("Heroes", {}).keys())
-            if heroes_found: char_mentions_str = ",".join(heroes_found)
-        except: pass
-            
-        update_analysis_results(rid, score, label, char_mentions_str, details_json)
-    print("Review analysis complete.")
-
-def process_chats(game_id=None, force=False):
-    from core.db import init_db, get_chats_for_analysis, update_chat_analysis
+    if _process_table("reviews", "reviews", DB_NAME, analyze_review_row,
+                      iter_reviews_for_analysis, count_reviews_for_analysis,
+                      game_id, force, workers, chunk_size, stale):
+        print("Review analysis complete.")
+
+def process_chats(game_id=None, force=False, workers=1, chunk_size=500, stale=False):
+    from core.db import init_db, CHAT_DB_NAME, iter_chats_for_analysis, count_chats_for_analysis
     init_db()
-    rows = get_chats_for_analysis(game_id, force)
-    if not rows:
-        print("No new chat messages to analyze.")
-        return
-    print(f"Analyzing {len(rows)} chat messages...")
-    for r in rows:
-        mid, content, gid, source, date = r
-        if not content: continue
-        current_gid = gid if gid else (game_id if game_id else "jump_assemble")
-        
-        # Additional cleaning for chats (commands, stickers)
-        if "使用export" in content or "🤖" in content:
-            # Mark as Neutral and skip heavy analysis
-            update_chat_analysis(mid, 0.5, "Neutral", None, "{}")
-            continue
-
-        metadata = {"source": source, "date": date, "full_content": content}
-        score, label = analyze_sentiment(content)
-        details_json = detailed_aspect_analysis(content, current_gid, metadata=metadata)
-        
-        char_mentions_str = None
-        try:
-            details = json.loads(details_json)
-            heroes_found = list(details.get("Heroes", {}).keys())
-            if heroes_found: char_mentions_str = ",".join(heroes_found)
-        except: pass
-            
-        update_chat_analysis(mid, score, label, char_mentions_str, details_json)
-    print("Chat analysis complete.")
-
-def run_all_analysis(game_id=None, force=False):
-    process_reviews(game_id, force)
-    process_chats(game_id, force)
+    if _process_table("chat messages", "chat_messages", CHAT_DB_NAME, analyze_chat_row,
+                      iter_chats_for_analysis, count_chats_for_analysis,
+                      game_id, force, workers, chunk_size, stale):
+        print("Chat analysis complete.")
+
+def run_all_analysis(game_id=None, force=False, workers=1, stale=False):
+    """stale: only re-analyze rows whose stored analyzer version / hero fingerprint is out of date."""
+    process_reviews(game_id, force, workers, stale=stale)
+    process_chats(game_id, force, workers, stale=stale)
@@ -2,6 +2,7 @@ import time
 import os
 from playwright.sync_api import sync_playwright
 from core.db import init_db
+from core.crawlers.base import ReviewWriter
 from config.settings import GAMES
 import datetime
 
@@ -76,18 +77,23 @@ def run_crawler(game_key="jump_assemble", days_back=None, source_filter=None):
                 page = context.new_page()
                 print(f"Navigating to {url}...")
                 
-                # Dispatcher Logic
-                if "taptap.cn" in url:
-                    scrape_taptap_cn(page, url, cutoff_date, game_key)
-                elif "taptap.io" in url:
-                    scrape_taptap_intl(page, url, cutoff_date, game_key)
-                elif "youtube" in url or "youtu.be" in url:
-                    scrape_youtube(page, url, cutoff_date, game_key)
-                elif "qoo-app" in url:
-                    scrape_qooapp(page, url, cutoff_date, game_key)
-                elif "forum.gamer.com.tw" in url:
-                    scrape_bahamut(page, url, cutoff_date, game_key)
-                elif "discord.com" in url:
+                # Dispatcher Logic (reviews are written in batches by the ReviewWriter)
+                if "discord.com" not in url:
+                    with ReviewWriter() as writer:
+                        if "taptap.cn" in url:
+                            scrape_taptap_cn(page, url, cutoff_date, game_key)
+                        elif "taptap.io" in url:
+                            scrape_taptap_intl(page, url, cutoff_date, game_key)
+                        elif "youtube" in url or "youtu.be" in url:
+                            scrape_youtube(page, url, cutoff_date, game_key)
+                        elif "qoo-app" in url:
+                            scrape_qooapp(page, url, cutoff_date, game_key)
+                        elif "forum.gamer.com.tw" in url:
+                            scrape_bahamut(page, url, cutoff_date, game_key)
+                        else:
+                            print(f"Unknown source for URL: {url}")
+                    print(f"  DB: {writer.inserted} new reviews, {writer.duplicates} already stored")
+                else:
                     # Redirected to local import logic
                     print(f"  [discord] Redirecting {url} to local TXT import...")
                     from core.utils.discord_helper import import_discord_files
@@ -95,9 +101,6 @@ def run_crawler(game_key="jump_assemble", days_back=None, source_filter=None):
                     # No page navigation needed for discord
                     page.close()
                     continue
-
-                else:
-                    print(f"Unknown source for URL: {url}")
                 
                 page.close()
                 
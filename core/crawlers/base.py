@@ -3,7 +3,8 @@
 import datetime
 import re
 import hashlib
-from core.db import save_review
+import time
+from core.db import save_review, save_reviews_bulk
 
 def parse_date(text):
     # 1. Try standard dates YYYY-MM-DD
@@ -53,7 +54,62 @@ def parse_date(text):
 
     return None, "Unknown"
 
-def save_review_helper(game_key, author, content, rating, date_str, source, content_title=None, content_url=None, original_date=None):
+class ReviewWriter:
+    """
+    Buffers reviews and writes them with save_reviews_bulk once `max_items` are
+    pending or `max_seconds` have passed since the last write (checked on add).
+    While used as a context manager it is the active writer, so save_review_helper
+    calls inside the block are batched; leaving the block writes the remainder.
+    """
+    def __init__(self, max_items=200, max_seconds=10.0):
+        self.max_items = max_items
+        self.max_seconds = max_seconds
+        self.pending = []
+        self.inserted = 0
+        self.duplicates = 0
+        self.last_flush = time.time()
+        self._previous = None
+
+    def add(self, review_data):
+        self.pending.append(review_data)
+        if len(self.pending) >= self.max_items or time.time() - self.last_flush >= self.max_seconds:
+            self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        self.last_flush = time.time()
+        if not batch:
+            return
+        try:
+            inserted, duplicates = save_reviews_bulk(batch)
+        except Exception as e:
+            # One bad review shouldn't cost the whole batch
+            print(f"Error saving {len(batch)} reviews in bulk ({e}), saving one by one...")
+            for review_data in batch:
+                saved = save_review(review_data)
+                if saved:
+                    self.inserted += 1
+                elif saved is False:
+                    self.duplicates += 1
+            return
+        self.inserted += inserted
+        self.duplicates += duplicates
+
+    def __enter__(self):
+        global _active_writer
+        self._previous, _active_writer = _active_writer, self
+        return self
+
+    def __exit__(self, *exc):
+        global _active_writer
+        _active_writer = self._previous
+        self.flush()
+        return False
+
+_active_writer = None
+
+def save_review_helper(game_key, author, content, rating, date_str, source, content_title=None, content_url=None, original_date=None, writer=None):
+    """Save one scraped review; goes through `writer` (or the active ReviewWriter) when there is one."""
     review_id = hashlib.md5(f"{author}{date_str}{content}".encode()).hexdigest()
     
     # Validation: If date_str is not YYYY-MM-DD, try to use current date?
@@ -62,7 +118,7 @@ def save_review_helper(game_key, author, content, rating, date_str, source, cont
     if not re.match(r'\d{4}-\d{2}-\d{2}', date_str):
         final_date = datetime.datetime.now().strftime('%Y-%m-%d')
     
-    save_review({
+    review_data = {
         'id': review_id,
         'game_id': game_key,
         'author': author,
@@ -73,4 +129,9 @@ def save_review_helper(game_key, author, content, rating, date_str, source, cont
         'source': source,
         'content_title': content_title,
         'content_url': content_url
-    })
+    }
+    writer = writer or _active_writer
+    if writer is not None:
+        writer.add(review_data)
+    else:
+        save_review(review_data)
@@ -1,14 +1,316 @@
 import sqlite3
 import datetime
+import threading
+import hashlib
+import unicodedata
+import re
 
 import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_NAME = os.path.join(BASE_DIR, 'data', 'jump_reviews.db')
 CHAT_DB_NAME = os.path.join(BASE_DIR, 'data', 'jump_chats.db')
+EMBEDDING_DIR = os.path.join(BASE_DIR, 'data', 'embeddings')
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'data', 'archive')
+
+# --- Connection Manager ---
+# Applied to every pooled connection. WAL lets the crawler, the analyzer and the
+# web UI read while another process writes; NORMAL sync is safe under WAL (a
+# power cut can lose the last commits, never corrupt the file).
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",       # 64 MB page cache
+    "PRAGMA mmap_size=268435456",     # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+BUSY_TIMEOUT = 30  # seconds to wait on a locked DB before raising
+
+_local = threading.local()
+
+def _pool():
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    return _local.connections
+
+def _open(db_path):
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection(db_path):
+    """
+    This thread's pooled connection to db_path, opened on first use with SQLITE_PRAGMAS.
+    Don't close it; use `with conn:` (or commit/rollback) to end transactions.
+    Forked processes (analysis workers) get fresh connections.
+    """
+    pool = _pool()
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = _open(db_path)
+    return conn
+
+def close_connections():
+    """Close this thread's pooled connections (end of a CLI run, before replacing a DB file)."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+# --- Query Builder ---
+DEFAULT_GAME = "jump_assemble"  # rows saved before game_id existed belong to it
+DATE_COLUMNS = {"reviews": "review_date", "chat_messages": "message_date", "mentions": "date",
+                "content": "review_date", "all_mentions": "date", "archive_rollups": "day"}
+
+def _date_str(value):
+    """'YYYY-MM-DD' for a date/datetime/Timestamp or date string."""
+    return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)[:10]
+
+class RowQuery:
+    """
+    Parameterized SELECT over reviews, chat_messages, mentions or the unified
+    views (content, all_mentions) for the common filter shapes: game, date
+    range, source set, analyzed state, keyset paging.
+    Values always go in as ? parameters and the SQL text only depends on which
+    filters are set, so sqlite3's statement cache reuses it across calls.
+
+        RowQuery("reviews", "id, content").game(game_id).analyzed(False).order_by("id").limit(500)
+    """
+    def __init__(self, table, columns="*"):
+        if table not in DATE_COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        self.table = table
+        self.date_col = DATE_COLUMNS[table]
+        self.columns = columns
+        self.conditions = []
+        self.params = []
+        self.group = None
+        self.order = None
+        self.limit_n = None
+
+    def where(self, condition, *params):
+        """Raw condition with ? placeholders, for shapes the filters below don't cover."""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def game(self, game_id, exact=False):
+        """Rows of game_id. Unless exact, rows without a game_id count as DEFAULT_GAME."""
+        if not game_id:
+            return self
+        if game_id == DEFAULT_GAME and not exact:
+            return self.where("(game_id = ? OR game_id IS NULL)", game_id)
+        return self.where("game_id = ?", game_id)
+
+    def dates(self, start=None, end=None):
+        """ISO date range. end includes the whole day, so chat timestamps on it match too."""
+        if start:
+            self.where(f"{self.date_col} >= ?", _date_str(start))
+        if end:
+            day_after = datetime.datetime.strptime(_date_str(end), '%Y-%m-%d') + datetime.timedelta(days=1)
+            self.where(f"{self.date_col} < ?", day_after.strftime('%Y-%m-%d'))
+        return self
+
+    def date_prefix(self, prefix):
+        if prefix:
+            self.where(f"{self.date_col} LIKE ?", f"{prefix}%")
+        return self
+
+    def sources(self, sources):
+        sources = list(sources or [])
+        if sources:
+            self.where(f"source IN ({', '.join('?' * len(sources))})", *sources)
+        return self
+
+    def analyzed(self, done=True):
+        return self.where("detailed_analysis IS NOT NULL" if done else "detailed_analysis IS NULL")
+
+    def after(self, after_id):
+        """Keyset paging: rows with id > after_id (no-op for None)."""
+        if after_id is not None:
+            self.where("id > ?", after_id)
+        return self
+
+    def group_by(self, columns):
+        self.group = columns
+        return self
+
+    def order_by(self, columns):
+        self.order = columns
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def build(self):
+        """(sql, params)"""
+        sql = f"SELECT {self.columns} FROM {self.table}"
+        if self.conditions:
+            sql += " WHERE " + " AND ".join(self.conditions)
+        if self.group:
+            sql += f" GROUP BY {self.group}"
+        if self.order:
+            sql += f" ORDER BY {self.order}"
+        params = list(self.params)
+        if self.limit_n is not None:
+            sql += " LIMIT ?"
+            params.append(self.limit_n)
+        return sql, params
+
+    def _connection(self, db_path):
+        """Views run on the unified connection (or, given an archive DB path, on that archive's); tables on db_path's."""
+        if self.table in UNIFIED_VIEWS:
+            return get_archive_connection(db_path) if db_path else get_unified_connection()
+        return get_connection(db_path)
+
+    def fetchall(self, db_path=None):
+        sql, params = self.build()
+        return self._connection(db_path).execute(sql, params).fetchall()
+
+    def to_frame(self, db_path=None):
+        """DataFrame of the result; empty if the DB doesn't exist yet or the query fails (logged)."""
+        import pandas as pd
+        if not os.path.exists(db_path or DB_NAME):
+            return pd.DataFrame()
+        sql, params = self.build()
+        try:
+            return pd.read_sql_query(sql, self._connection(db_path), params=params)
+        except Exception as e:
+            print(f"Error querying {self.table}: {e}")
+            return pd.DataFrame()
+
+# Progress markers for resumable analysis runs (one row per job)
+CHECKPOINT_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS analysis_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_id TEXT,
+        updated_at TEXT
+    )
+'''
+
+# One row per hero/aspect item of detailed_analysis, kept in sync at analysis time
+# so dashboards and reports can aggregate with GROUP BY instead of parsing JSON.
+# Lives in both DBs; row_id refers to reviews.id / chat_messages.id.
+MENTIONS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS mentions (
+        row_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        dimension TEXT,
+        seq INTEGER,
+        label TEXT,
+        score REAL,
+        text TEXT,
+        tags TEXT,
+        date TEXT,
+        source TEXT,
+        game_id TEXT
+    )
+'''
+MENTIONS_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_mentions_row ON mentions (row_id)",
+    "CREATE INDEX IF NOT EXISTS idx_mentions_kind_key ON mentions (kind, key, label)",
+    "CREATE INDEX IF NOT EXISTS idx_mentions_kind_date ON mentions (kind, date)",
+]
+MENTION_COLUMNS = "row_id, kind, key, dimension, seq, label, score, text, tags, date, source, game_id"
+
+# --- Unified View ---
+# A connection on the reviews DB with the chats DB ATTACHed as `chats`, plus TEMP
+# views (a persistent view can't span databases) that UNION ALL the two:
+#   content       reviews + chat messages in the reviews layout (message_date ->
+#                 review_date, rating 0 for chats), source_table says which one
+#   all_mentions  the mentions tables of both DBs
+# SQLite pushes WHERE terms into each arm of a UNION ALL view, so filters on the
+# views still use the per-table indexes and only matching rows are read.
+CONTENT_COLUMNS = [
+    "id", "game_id", "author", "rating", "content", "review_date", "sentiment_score", "sentiment_label",
+    "character_mentions", "detailed_analysis", "crawled_at", "source", "content_title", "content_url",
+    "original_date", "analyzer_version", "hero_fingerprint", "embedding", "embedding_row", "x", "y",
+    "cluster_label", "channel", "source_table",
+]
+_CHAT_CONTENT_COLUMNS = {"rating": "0", "review_date": "message_date", "content_title": "NULL",
+                         "content_url": "NULL", "original_date": "NULL", "source_table": "'chat_messages'"}
+_REVIEW_CONTENT_COLUMNS = {"channel": "NULL", "source_table": "'reviews'"}
+
+def _view_select(table, overrides):
+    return f"SELECT {', '.join(f'{overrides.get(c, c)} AS {c}' for c in CONTENT_COLUMNS)} FROM {table}"
+
+def _unified_views_sql(chats="chats"):
+    """View definitions over main.reviews and {chats}.chat_messages (an archive DB has both in main)."""
+    mentions = f"SELECT {MENTION_COLUMNS} FROM main.mentions"
+    if chats != "main":
+        mentions += f" UNION ALL SELECT {MENTION_COLUMNS} FROM {chats}.mentions"
+    return [
+        "CREATE TEMP VIEW IF NOT EXISTS content AS "
+        + _view_select("main.reviews", _REVIEW_CONTENT_COLUMNS)
+        + " UNION ALL " + _view_select(f"{chats}.chat_messages", _CHAT_CONTENT_COLUMNS),
+        f"CREATE TEMP VIEW IF NOT EXISTS all_mentions AS {mentions}",
+    ]
+UNIFIED_VIEWS = ("content", "all_mentions")
+
+def get_unified_connection():
+    """This thread's pooled connection with both DBs attached and the unified views defined."""
+    pool = _pool()
+    key = ("unified", DB_NAME, CHAT_DB_NAME)
+    conn = pool.get(key)
+    if conn is None:
+        conn = _open(DB_NAME)
+        conn.execute("ATTACH DATABASE ? AS chats", (CHAT_DB_NAME,))
+        for pragma in SQLITE_PRAGMAS:  # unqualified pragmas only cover `main`
+            conn.execute(pragma.replace("PRAGMA ", "PRAGMA chats.", 1))
+        for sql in _unified_views_sql():
+            conn.execute(sql)
+        pool[key] = conn
+    return conn
+
+def get_archive_connection(archive_path):
+    """Pooled connection to one archive DB, with the same views over its own tables."""
+    pool = _pool()
+    key = ("archive", archive_path)
+    conn = pool.get(key)
+    if conn is None:
+        conn = _open(archive_path)
+        for sql in _unified_views_sql("main"):
+            conn.execute(sql)
+        pool[key] = conn
+    return conn
+
+def _create_mentions_table(conn, table, date_col):
+    """Create the mentions table; when it is new, backfill it from stored detailed_analysis."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mentions'").fetchone()
+    conn.execute(MENTIONS_TABLE_SQL)
+    for sql in MENTIONS_INDEX_SQL:
+        conn.execute(sql)
+    conn.commit()
+    if not exists:
+        _backfill_mentions(conn, table, date_col)
+
+def _backfill_mentions(conn, table, date_col, chunk_size=1000):
+    from core.details import load_details, mention_rows
+    after_id = ""
+    while True:
+        sql, params = RowQuery(table, f"id, detailed_analysis, {date_col}, source, game_id") \
+            .after(after_id).analyzed().order_by("id").limit(chunk_size).build()
+        rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return
+        mentions = []
+        for rid, details, date, source, game_id in rows:
+            mentions += mention_rows(rid, load_details(details), date, source, game_id)
+        with conn:
+            _replace_mentions(conn, [r[0] for r in rows], mentions)
+        after_id = rows[-1][0]
+
+def _replace_mentions(conn, row_ids, rows):
+    """Swap the mentions of row_ids for `rows` (inside the caller's transaction)."""
+    conn.executemany("DELETE FROM mentions WHERE row_id = ?", [(rid,) for rid in row_ids])
+    if rows:
+        conn.executemany(f"INSERT INTO mentions ({MENTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
 
 def init_db():
     # 1. Platform Reviews DB
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(DB_NAME)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS reviews (
@@ -26,14 +328,16 @@ def init_db():
             source TEXT,
             content_title TEXT,
             content_url TEXT,
-            original_date TEXT
+            original_date TEXT,
+            analyzer_version TEXT,
+            hero_fingerprint TEXT
         )
     ''')
+    c.execute(CHECKPOINT_TABLE_SQL)
     conn.commit()
-    conn.close()
 
     # 2. Chat / Community DB
-    chat_conn = sqlite3.connect(CHAT_DB_NAME)
+    chat_conn = get_connection(CHAT_DB_NAME)
     cc = chat_conn.cursor()
     cc.execute('''
         CREATE TABLE IF NOT EXISTS chat_messages (
@@ -52,105 +356,218 @@ def init_db():
             embedding BLOB,
             x REAL,
             y REAL,
-            cluster_label TEXT
+            cluster_label TEXT,
+            analyzer_version TEXT,
+            hero_fingerprint TEXT
         )
     ''')
+    cc.execute(CHECKPOINT_TABLE_SQL)
     chat_conn.commit()
-    chat_conn.close()
 
-def migrate_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # Existing Migrations
-    try: c.execute("ALTER TABLE reviews ADD COLUMN detailed_analysis TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN game_id TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN source TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN original_date TEXT")
-    except: pass
-    
-    # Standardized Columns
-    try: c.execute("ALTER TABLE reviews ADD COLUMN content_title TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN content_url TEXT")
-    except: pass
-    
-    # Semantic Map Columns
-    try: c.execute("ALTER TABLE reviews ADD COLUMN embedding BLOB")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN x REAL")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN y REAL")
-    except: pass
-    try: c.execute("ALTER TABLE reviews ADD COLUMN cluster_label TEXT")
-    except: pass
-        
+    migrate_db()
+
+# --- Schema Migrations ---
+# Numbered steps per DB, applied in order; PRAGMA user_version stores the last
+# step applied, so an up-to-date DB costs one PRAGMA read at startup. Column
+# steps look at table_info first because DBs from before versioning
+# (user_version 0) already have some of these columns.
+def _add_columns(conn, table, columns):
+    existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, col_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
+REVIEW_MIGRATIONS = [
+    # 1. Source, standardized and semantic map columns
+    lambda conn: _add_columns(conn, "reviews", [
+        ("detailed_analysis", "TEXT"), ("game_id", "TEXT"), ("source", "TEXT"), ("original_date", "TEXT"),
+        ("content_title", "TEXT"), ("content_url", "TEXT"),
+        ("embedding", "BLOB"), ("x", "REAL"), ("y", "REAL"), ("cluster_label", "TEXT"),
+    ]),
+    # 2. Incremental re-analysis columns
+    lambda conn: _add_columns(conn, "reviews", [("analyzer_version", "TEXT"), ("hero_fingerprint", "TEXT")]),
+    # 3. Normalized mentions (backfilled from detailed_analysis)
+    lambda conn: _create_mentions_table(conn, "reviews", "review_date"),
+    # 4. Indexes for game/date/source filters and the unanalyzed backlog
+    lambda conn: _create_indexes(conn, "reviews", "review_date"),
+    # 5. Binary float32 embeddings + their row in the embedding store
+    lambda conn: _migrate_embeddings(conn, "reviews"),
+    # 6. Content fingerprint with a unique index (re-crawl dedup)
+    lambda conn: _add_content_hash(conn),
+    # 7. Archive bookkeeping: tombstones of archived rows, rollups
+    lambda conn: _create_archive_tables(conn, "reviews"),
+]
+
+CHAT_MIGRATIONS = [
+    # 1. Incremental re-analysis columns
+    lambda conn: _add_columns(conn, "chat_messages", [("analyzer_version", "TEXT"), ("hero_fingerprint", "TEXT")]),
+    # 2. Normalized mentions (backfilled from detailed_analysis)
+    lambda conn: _create_mentions_table(conn, "chat_messages", "message_date"),
+    # 3. Indexes for game/date/source filters and the unanalyzed backlog
+    lambda conn: _create_indexes(conn, "chat_messages", "message_date"),
+    # 4. Binary float32 embeddings + their row in the embedding store
+    lambda conn: _migrate_embeddings(conn, "chat_messages"),
+    # 5. Archive bookkeeping: tombstones of archived rows, rollups
+    lambda conn: _create_archive_tables(conn, "chat_messages"),
+]
+
+def _create_indexes(conn, table, date_col):
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_game_date ON {table} (game_id, {date_col})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table} ({date_col})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_source ON {table} (source)")
+    # Partial index: only rows still waiting for analysis, in keyset order
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_unanalyzed ON {table} (id) WHERE detailed_analysis IS NULL")
+    conn.commit()
+
+def _migrate_embeddings(conn, table, chunk_size=500):
+    """
+    Add embedding_row and rewrite pickled embedding BLOBs in the binary format
+    (model unknown, left empty). Pickles that can't be read are cleared so the
+    semantic scripts embed those rows again.
+    """
+    _add_columns(conn, table, [("embedding_row", "INTEGER")])
+    from core.embeddings import embedding_header, pickled_embedding, pack_embedding
+    converted = cleared = 0
+    after_id = ""
+    while True:
+        sql, params = RowQuery(table, "id, embedding").after(after_id) \
+            .where("embedding IS NOT NULL").order_by("id").limit(chunk_size).build()
+        rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rid, blob in rows:
+            if embedding_header(blob) is not None:
+                continue
+            vector = pickled_embedding(blob)
+            if vector is None:
+                cleared += 1
+                updates.append((None, rid))
+            else:
+                converted += 1
+                updates.append((pack_embedding(vector), rid))
+        with conn:
+            conn.executemany(f"UPDATE {table} SET embedding = ? WHERE id = ?", updates)
+        after_id = rows[-1][0]
+    if converted or cleared:
+        print(f"{table}: converted {converted} pickled embeddings, cleared {cleared} unreadable")
+
+def _add_content_hash(conn, chunk_size=1000):
+    """
+    Add reviews.content_hash and its unique index, then fill it in rowid order:
+    the first copy of a review gets the hash, later copies (stored again by
+    re-crawls) stay NULL until remove_duplicate_reviews deletes them.
+    """
+    _add_columns(conn, "reviews", [("content_hash", "TEXT")])
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_content_hash ON reviews (content_hash)")
     conn.commit()
-    conn.close()
+    after = 0
+    while True:
+        rows = conn.execute("SELECT rowid, author, content, source, content_url FROM reviews "
+                            "WHERE rowid > ? AND content_hash IS NULL ORDER BY rowid LIMIT ?", (after, chunk_size)).fetchall()
+        if not rows:
+            return
+        with conn:
+            # OR IGNORE: a hash already taken by an earlier row leaves this one NULL
+            conn.executemany("UPDATE OR IGNORE reviews SET content_hash = ? WHERE rowid = ?",
+                             [(content_fingerprint(author, content, source, url), rowid)
+                              for rowid, author, content, source, url in rows])
+        after = rows[-1][0]
+
+def _run_migrations(conn, migrations):
+    """Apply the steps past the DB's user_version. Returns the number applied."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for step in range(version, len(migrations)):
+        migrations[step](conn)
+        conn.execute(f"PRAGMA user_version = {step + 1}")
+        conn.commit()
+    return max(len(migrations) - version, 0)
+
+def migrate_db():
+    """Bring both DBs up to the current schema version (run once at startup by init_db)."""
+    _run_migrations(get_connection(DB_NAME), REVIEW_MIGRATIONS)
+    _run_migrations(get_connection(CHAT_DB_NAME), CHAT_MIGRATIONS)
+
+# OR IGNORE covers both keys: the id and the content_hash unique index, so a
+# review crawled again under a new id (relative dates) is skipped as well.
+REVIEW_INSERT_SQL = '''
+    INSERT OR IGNORE INTO reviews (
+        id, game_id, author, rating, content, review_date, crawled_at, source, 
+        content_title, content_url, original_date, content_hash
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def content_fingerprint(author, content, source, url=None):
+    """
+    Dedup key of a review: md5 of author, normalized text (NFKC, casefolded,
+    whitespace collapsed), source and url. Unlike the id it leaves out the
+    date, which for "3 days ago" style dates changes on every crawl.
+    """
+    text = " ".join(unicodedata.normalize("NFKC", content or "").casefold().split())
+    key = "\x1f".join([(author or "").strip(), text, source or "", (url or "").strip()])
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+def _review_params(review_data):
+    author = review_data.get('author', 'Anonymous')
+    source = review_data.get('source', 'unknown')
+    content_url = review_data.get('content_url', '')
+    return (
+        review_data['id'],
+        review_data.get('game_id', 'jump_assemble'),
+        author,
+        review_data.get('rating', 0),
+        review_data['content'],
+        review_data.get('date', datetime.datetime.now().strftime('%Y-%m-%d')),
+        datetime.datetime.now().isoformat(),
+        source,
+        review_data.get('content_title', ''),
+        content_url,
+        review_data.get('original_date', ''),
+        content_fingerprint(author, review_data['content'], source, content_url)
+    )
 
 def save_review(review_data):
     """
     review_data: dict with id, game_id, author, rating, content, date, source, 
                  content_title, content_url, original_date
+    Returns True if inserted, False if already stored (duplicate), None on error.
     """
-    migrate_db() # Ensure connection/schema
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
+    conn = get_connection(DB_NAME)
     try:
-        c.execute('''
-            INSERT OR IGNORE INTO reviews (
-                id, game_id, author, rating, content, review_date, crawled_at, source, 
-                content_title, content_url, original_date
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            review_data['id'],
-            review_data.get('game_id', 'jump_assemble'),
-            review_data.get('author', 'Anonymous'),
-            review_data.get('rating', 0),
-            review_data['content'],
-            review_data.get('date', datetime.datetime.now().strftime('%Y-%m-%d')),
-            datetime.datetime.now().isoformat(),
-            review_data.get('source', 'unknown'),
-            review_data.get('content_title', ''),
-            review_data.get('content_url', ''),
-            review_data.get('original_date', '')
-        ))
+        inserted = conn.execute(REVIEW_INSERT_SQL, _review_params(review_data)).rowcount > 0
         conn.commit()
+        return inserted
     except Exception as e:
         print(f"Error saving review: {e}")
-    finally:
-        conn.close()
+        conn.rollback()
 
+def save_reviews_bulk(reviews):
+    """
+    Insert many review dicts (save_review's format) with one executemany in one transaction.
+    Returns (inserted, duplicates); reviews already in the DB (same id or same
+    content_fingerprint) are skipped. Errors propagate and nothing from the batch is written.
+    """
+    rows = [_review_params(r) for r in reviews]
+    if not rows:
+        return 0, 0
+    conn = get_connection(DB_NAME)
+    with conn:
+        inserted = conn.executemany(REVIEW_INSERT_SQL, rows).rowcount
+    return inserted, len(rows) - inserted
 
 def get_reviews_for_analysis(game_id=None, force=False):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    query = RowQuery("reviews", "id, content, game_id, source, review_date").game(game_id, exact=True)
+    if not force:
+        query.analyzed(False)
     try:
-        sql = "SELECT id, content, game_id, source, review_date FROM reviews"
-        conditions = []
-        if not force:
-            conditions.append("detailed_analysis IS NULL")
-        if game_id:
-            conditions.append(f"game_id = '{game_id}'")
-        
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-            
-        c.execute(sql)
-    except:
+        return query.fetchall(DB_NAME)
+    except sqlite3.OperationalError:
         migrate_db()
         return []
-        
-    rows = c.fetchall()
-    conn.close()
-    return rows
 
 def update_analysis_results(review_id, sentiment_score, sentiment_label, character_mentions, detailed_analysis=None):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(DB_NAME)
     c = conn.cursor()
     c.execute('''
         UPDATE reviews
@@ -158,57 +575,68 @@ def update_analysis_results(review_id, sentiment_score, sentiment_label, charact
         WHERE id = ?
     ''', (sentiment_score, sentiment_label, character_mentions, detailed_analysis, review_id))
     conn.commit()
-    conn.close()
+
+def update_analysis_results_batch(results, checkpoint=None):
+    """
+    results: list of (review_id, sentiment_score, sentiment_label, character_mentions, detailed_analysis,
+             analyzer_version, hero_fingerprint, mention_rows); the row's mentions are replaced
+    checkpoint: optional (job, last_id) recorded in the same transaction
+    """
+    conn = get_connection(DB_NAME)
+    with conn:
+        _write_analysis_results(conn, "reviews", results, checkpoint)
+
+CHAT_INSERT_SQL = '''
+    INSERT OR IGNORE INTO chat_messages (
+        id, game_id, channel, author, content, message_date, source, crawled_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _chat_params(msg_data):
+    return (
+        msg_data['id'],
+        msg_data.get('game_id', 'jump_assemble'),
+        msg_data.get('channel', 'unknown'),
+        msg_data.get('author', 'Anonymous'),
+        msg_data['content'],
+        msg_data['message_date'],
+        msg_data.get('source', 'discord_chat'),
+        datetime.datetime.now().isoformat()
+    )
 
 def save_chat_message(msg_data):
     """
     msg_data: dict with id, game_id, channel, author, content, message_date, source
+    Returns True if inserted, False if already stored (duplicate), None on error.
     """
-    conn = sqlite3.connect(CHAT_DB_NAME)
-    c = conn.cursor()
+    conn = get_connection(CHAT_DB_NAME)
     try:
-        c.execute('''
-            INSERT OR IGNORE INTO chat_messages (
-                id, game_id, channel, author, content, message_date, source, crawled_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            msg_data['id'],
-            msg_data.get('game_id', 'jump_assemble'),
-            msg_data.get('channel', 'unknown'),
-            msg_data.get('author', 'Anonymous'),
-            msg_data['content'],
-            msg_data['message_date'],
-            msg_data.get('source', 'discord_chat'),
-            datetime.datetime.now().isoformat()
-        ))
+        inserted = conn.execute(CHAT_INSERT_SQL, _chat_params(msg_data)).rowcount > 0
         conn.commit()
+        return inserted
     except Exception as e:
         print(f"Error saving chat message: {e}")
-    finally:
-        conn.close()
+        conn.rollback()
+
+def save_chat_messages_bulk(messages):
+    """Chat counterpart of save_reviews_bulk. Returns (inserted, duplicates)."""
+    rows = [_chat_params(m) for m in messages]
+    if not rows:
+        return 0, 0
+    conn = get_connection(CHAT_DB_NAME)
+    with conn:
+        inserted = conn.executemany(CHAT_INSERT_SQL, rows).rowcount
+    return inserted, len(rows) - inserted
 
 def get_chats_for_analysis(game_id=None, force=False):
-    conn = sqlite3.connect(CHAT_DB_NAME)
-    c = conn.cursor()
-    try:
-        sql = "SELECT id, content, game_id, source, message_date FROM chat_messages"
-        conditions = []
-        if not force:
-            conditions.append("detailed_analysis IS NULL")
-        if game_id:
-            conditions.append(f"game_id = '{game_id}'")
-        
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-        c.execute(sql)
-        rows = c.fetchall()
-        return rows
-    finally:
-        conn.close()
+    query = RowQuery("chat_messages", "id, content, game_id, source, message_date").game(game_id, exact=True)
+    if not force:
+        query.analyzed(False)
+    return query.fetchall(CHAT_DB_NAME)
 
 def update_chat_analysis(msg_id, sentiment_score, sentiment_label, character_mentions, detailed_analysis=None):
-    conn = sqlite3.connect(CHAT_DB_NAME)
+    conn = get_connection(CHAT_DB_NAME)
     c = conn.cursor()
     c.execute('''
         UPDATE chat_messages
@@ -216,46 +644,595 @@ def update_chat_analysis(msg_id, sentiment_score, sentiment_label, character_men
         WHERE id = ?
     ''', (sentiment_score, sentiment_label, character_mentions, detailed_analysis, msg_id))
     conn.commit()
-    conn.close()
 
-def get_all_data():
+def update_chat_analysis_batch(results, checkpoint=None):
+    """Chat counterpart of update_analysis_results_batch (same tuple layout)."""
+    conn = get_connection(CHAT_DB_NAME)
+    with conn:
+        _write_analysis_results(conn, "chat_messages", results, checkpoint)
+
+# --- Analysis Result Writes ---
+def _write_analysis_results(conn, table, results, checkpoint=None):
+    """One executemany UPDATE, the rows' mentions and the checkpoint, inside the caller's transaction."""
+    conn.executemany(f'''
+        UPDATE {table}
+        SET sentiment_score = ?, sentiment_label = ?, character_mentions = ?, detailed_analysis = ?,
+            analyzer_version = ?, hero_fingerprint = ?
+        WHERE id = ?
+    ''', [(score, label, mentions, details, version, heroes, rid)
+          for rid, score, label, mentions, details, version, heroes, _ in results])
+    _replace_mentions(conn, [r[0] for r in results], [m for r in results for m in r[7]])
+    if checkpoint:
+        _write_checkpoint(conn, *checkpoint)
+
+class AnalysisResultSink:
+    """
+    Buffers analysis results (update_analysis_results_batch tuples) for one table and
+    writes them every `flush_every` rows in a single transaction, together with
+    their mentions and, for resumable jobs, the checkpoint of the last id added.
+    Use as a context manager so the remainder is written on exit.
+    """
+    def __init__(self, db_path, table, job=None, flush_every=2000):
+        self.db_path = db_path
+        self.table = table
+        self.job = job
+        self.flush_every = flush_every
+        self.pending = []
+        self.last_id = None
+        self.written = 0
+
+    def add(self, results, last_id=None):
+        """results of a chunk whose rows run up to last_id (checkpointed with them)."""
+        self.pending.extend(results)
+        if last_id is not None:
+            self.last_id = last_id
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending and self.last_id is None:
+            return
+        # Taken before writing: a failed batch isn't retried on exit, its rows
+        # simply stay unanalyzed (and the checkpoint where it was)
+        batch, self.pending = self.pending, []
+        last_id, self.last_id = self.last_id, None
+        checkpoint = (self.job, last_id) if self.job and last_id is not None else None
+        conn = get_connection(self.db_path)
+        with conn:
+            _write_analysis_results(conn, self.table, batch, checkpoint)
+        self.written += len(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+# --- Streaming Analysis Reads & Checkpoints ---
+def _analysis_query(table, columns, game_id, force, after_id, stale=None):
+    """
+    RowQuery for the rows an analysis run should (still) process.
+    stale: optional {"version": v} to select rows not analyzed by version v, or
+    {"version": v, "default_game": g, "hero_fingerprints": {game: fp}} to select
+    version-v rows whose hero fingerprint differs from their game's (rows without
+    a game_id count as game g).
+    """
+    query = RowQuery(table, columns)
+    if stale:
+        # Empty rows are never written back, so they would be "stale" forever
+        query.where("content <> ''")
+    if stale and stale.get("hero_fingerprints"):
+        cases = " ".join("WHEN ? THEN ?" for _ in stale["hero_fingerprints"])
+        query.where("analyzer_version = ?", stale["version"])
+        case_params = [stale["default_game"]]
+        for game, fingerprint in stale["hero_fingerprints"].items():
+            case_params += [game, fingerprint]
+        query.where(f"hero_fingerprint IS NOT (CASE COALESCE(game_id, ?) {cases} END)", *case_params)
+    elif stale:
+        query.where("analyzer_version IS NOT ?", stale["version"])
+    elif not force:
+        query.analyzed(False)
+    return query.game(game_id, exact=True).after(after_id)
+
+def _iter_rows_for_analysis(db_path, table, date_col, game_id, force, chunk_size, after_id, stale=None):
+    """
+    Keyset-paginated (ORDER BY id) reads, so memory stays flat regardless of backlog size.
+    Hero-only stale passes also read the stored sentiment and detailed_analysis.
+    """
+    columns = f"id, content, game_id, source, {date_col}"
+    if stale and stale.get("hero_fingerprints"):
+        columns += ", sentiment_score, sentiment_label, detailed_analysis"
+    while True:
+        rows = _analysis_query(table, columns, game_id, force, after_id, stale) \
+            .order_by("id").limit(chunk_size).fetchall(db_path)
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def _count_rows_for_analysis(db_path, table, game_id, force, after_id, stale=None):
+    return _analysis_query(table, "COUNT(*)", game_id, force, after_id, stale).fetchall(db_path)[0][0]
+
+def iter_reviews_for_analysis(game_id=None, force=False, chunk_size=500, after_id=None, stale=None):
+    return _iter_rows_for_analysis(DB_NAME, "reviews", "review_date", game_id, force, chunk_size, after_id, stale)
+
+def count_reviews_for_analysis(game_id=None, force=False, after_id=None, stale=None):
+    return _count_rows_for_analysis(DB_NAME, "reviews", game_id, force, after_id, stale)
+
+def iter_chats_for_analysis(game_id=None, force=False, chunk_size=500, after_id=None, stale=None):
+    return _iter_rows_for_analysis(CHAT_DB_NAME, "chat_messages", "message_date", game_id, force, chunk_size, after_id, stale)
+
+def count_chats_for_analysis(game_id=None, force=False, after_id=None, stale=None):
+    return _count_rows_for_analysis(CHAT_DB_NAME, "chat_messages", game_id, force, after_id, stale)
+
+def get_analysis_game_ids(db_path, table):
+    """Distinct game_id values (None included) present in an analysis table."""
+    return [r[0] for r in RowQuery(table, "DISTINCT game_id").fetchall(db_path)]
+
+def _write_checkpoint(conn, job, last_id):
+    conn.execute(
+        "INSERT OR REPLACE INTO analysis_checkpoints (job, last_id, updated_at) VALUES (?, ?, ?)",
+        (job, last_id, datetime.datetime.now().isoformat())
+    )
+
+def get_checkpoint(db_path, job):
+    conn = get_connection(db_path)
+    row = conn.execute("SELECT last_id FROM analysis_checkpoints WHERE job = ?", (job,)).fetchone()
+    return row[0] if row else None
+
+def clear_checkpoint(db_path, job):
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("DELETE FROM analysis_checkpoints WHERE job = ?", (job,))
+
+# --- detailed_analysis Compaction (v1 -> v2) ---
+def _compact_table_details(db_path, table, chunk_size=500):
+    """Rewrite legacy detailed_analysis values (per-item metadata) in the compact layout."""
+    from core.details import compact_details_json
+    converted = 0
+    after_id = ""
+    while True:
+        conn = get_connection(db_path)
+        rows = RowQuery(table, "id, detailed_analysis").after(after_id) \
+            .where("detailed_analysis LIKE ?", '%"metadata"%').order_by("id").limit(chunk_size).fetchall(db_path)
+        if not rows:
+            return converted
+        updates = []
+        for rid, details in rows:
+            compact = compact_details_json(details)
+            if compact is not None:
+                updates.append((compact, rid))
+        with conn:
+            conn.executemany(f"UPDATE {table} SET detailed_analysis = ? WHERE id = ?", updates)
+        converted += len(updates)
+        after_id = rows[-1][0]
+
+def _db_size(db_path):
+    """Bytes of a WAL-mode DB on disk (main file + -wal)."""
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+def migrate_compact_details(vacuum=True):
+    """
+    One-off migration of existing rows to the compact detailed_analysis layout.
+    Safe to re-run (already compact rows are skipped); VACUUM hands the freed
+    pages back to the filesystem.
+    """
+    for db_path, table in ((DB_NAME, "reviews"), (CHAT_DB_NAME, "chat_messages")):
+        if not os.path.exists(db_path):
+            continue
+        before = _db_size(db_path)
+        converted = _compact_table_details(db_path, table)
+        if converted and vacuum:
+            conn = get_connection(db_path)
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = _db_size(db_path)
+        print(f"{table}: compacted {converted} rows, {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+# --- Duplicate Reviews ---
+def remove_duplicate_reviews(chunk_size=1000):
+    """
+    Delete the reviews stored more than once before content_hash existed (the
+    copies the migration left without a hash), with their mentions. A row
+    without a hash whose fingerprint is still free gets it instead.
+    Returns the number of rows deleted.
+    """
+    conn = get_connection(DB_NAME)
+    removed = 0
+    after = 0
+    while True:
+        rows = conn.execute("SELECT rowid, id, author, content, source, content_url FROM reviews "
+                            "WHERE rowid > ? AND content_hash IS NULL ORDER BY rowid LIMIT ?", (after, chunk_size)).fetchall()
+        if not rows:
+            break
+        duplicates = []
+        with conn:
+            for rowid, rid, author, content, source, url in rows:
+                fingerprint = content_fingerprint(author, content, source, url)
+                if conn.execute("SELECT 1 FROM reviews WHERE content_hash = ?", (fingerprint,)).fetchone():
+                    duplicates.append(rid)
+                else:
+                    conn.execute("UPDATE reviews SET content_hash = ? WHERE rowid = ?", (fingerprint, rowid))
+            conn.executemany("DELETE FROM reviews WHERE id = ?", [(rid,) for rid in duplicates])
+            _replace_mentions(conn, duplicates, [])
+        removed += len(duplicates)
+        after = rows[-1][0]
+    print(f"reviews: removed {removed} duplicate rows")
+    return removed
+
+# --- Embedding Store ---
+# The embedding BLOBs stay the source of truth; the store under EMBEDDING_DIR is
+# a memory-mapped copy of all of them (both DBs) as one float32 matrix, and
+# embedding_row says which arena row holds a review's/message's vector.
+# save_embeddings writes both; load_embedding_matrix rebuilds the arena from
+# the BLOBs when it is missing or behind the DBs.
+def _embedding_tables():
+    return ((DB_NAME, "reviews"), (CHAT_DB_NAME, "chat_messages"))
+
+def _embedding_store():
+    from core.embeddings import EmbeddingStore
+    return EmbeddingStore(os.path.join(EMBEDDING_DIR, "embeddings.f32"))
+
+def _clear_embedding_rows():
+    for db_path, table in _embedding_tables():
+        if os.path.exists(db_path):
+            conn = get_connection(db_path)
+            with conn:
+                conn.execute(f"UPDATE {table} SET embedding_row = NULL WHERE embedding_row IS NOT NULL")
+
+def save_embeddings(db_path, table, ids, vectors, model=""):
+    """
+    Store embeddings for `ids`: float32 BLOBs in the row plus an arena row each.
+    A different model or dimension than the store holds starts a new store
+    (vectors of different models can't be clustered together).
+    """
+    from core.embeddings import as_float32_matrix, pack_embedding
+    ids = list(ids)
+    if not ids:
+        return 0
+    matrix = as_float32_matrix(vectors)
+    store = _embedding_store()
+    if store.dim is None:
+        # No store yet (first save after upgrading): index the converted legacy BLOBs first
+        rebuild_embedding_store()
+        store = _embedding_store()
+    if not store.compatible(matrix.shape[1], model):
+        _clear_embedding_rows()
+        store.reset(matrix.shape[1], model)
+    first = store.append(matrix)
+    conn = get_connection(db_path)
+    with conn:
+        conn.executemany(f"UPDATE {table} SET embedding = ?, embedding_row = ? WHERE id = ?",
+                         [(pack_embedding(vec, model), first + i, rid) for i, (rid, vec) in enumerate(zip(ids, matrix))])
+    return len(ids)
+
+def _iter_embedding_blobs(db_path, table, chunk_size):
+    after_id = ""
+    while True:
+        rows = RowQuery(table, "id, embedding").after(after_id) \
+            .where("embedding IS NOT NULL").order_by("id").limit(chunk_size).fetchall(db_path)
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def rebuild_embedding_store(chunk_size=1000):
+    """
+    Rewrite the store from the embedding BLOBs of both DBs, which also drops
+    dead rows. Takes the dimension most rows have (plus its model name);
+    embeddings of other models stay out of the store. Returns the row count.
+    """
+    from collections import Counter
+    from core.embeddings import embedding_header, unpack_embedding
+    tables = [(db_path, table) for db_path, table in _embedding_tables() if os.path.exists(db_path)]
+    dims, models = Counter(), Counter()
+    for db_path, table in tables:
+        for rows in _iter_embedding_blobs(db_path, table, chunk_size):
+            for _, blob in rows:
+                header = embedding_header(blob)
+                if header:
+                    dims[header[1]] += 1
+                    if header[0]:
+                        models[header[:2]] += 1
+    _clear_embedding_rows()
+    if not dims:
+        return 0
+    dim = dims.most_common(1)[0][0]
+    named = [m for (m, d), _ in models.most_common() if d == dim]
+    store = _embedding_store()
+    store.reset(dim, named[0] if named else "")
+
+    total = 0
+    for db_path, table in tables:
+        conn = get_connection(db_path)
+        for rows in _iter_embedding_blobs(db_path, table, chunk_size):
+            ids, vectors = [], []
+            for rid, blob in rows:
+                decoded = unpack_embedding(blob)
+                if decoded and len(decoded[1]) == dim and store.compatible(dim, decoded[0]):
+                    ids.append(rid)
+                    vectors.append(decoded[1])
+            if not ids:
+                continue
+            first = store.append(vectors)
+            with conn:
+                conn.executemany(f"UPDATE {table} SET embedding_row = ? WHERE id = ?",
+                                 [(first + i, rid) for i, rid in enumerate(ids)])
+            total += len(ids)
+    print(f"Embedding store rebuilt: {total} x {dim} ({store.model or 'unknown model'})")
+    return total
+
+def _embedding_index(columns=()):
+    """(embedding_row, source_table, id, *columns) of every row in the store, in arena order (content view)."""
+    return RowQuery("content", ", ".join(("embedding_row", "source_table", "id") + tuple(columns))) \
+        .where("embedding_row IS NOT NULL").order_by("embedding_row").fetchall()
+
+def load_embedding_matrix(columns=()):
+    """
+    All stored embeddings as ([(table, id, *columns), ...], (N, dim) float32
+    matrix), rows in the same order. If every arena row is live (the usual
+    case) the matrix is the read-only memmap itself, no copy; otherwise the
+    live rows are gathered.
+    """
+    store = _embedding_store()
+    index = _embedding_index(columns)
+    if store.dim is None or (index and index[-1][0] >= len(store)):
+        rebuild_embedding_store()
+        store = _embedding_store()
+        index = _embedding_index(columns)
+    keys = [tuple(r[1:]) for r in index]
+    matrix = store.matrix()
+    if len(index) == len(matrix):  # rows are unique, so this means 0..n-1 all live
+        return keys, matrix
+    return keys, matrix[[r[0] for r in index]]
+
+def load_semantic_frame():
+    """Embedding matrix (memory-mapped, both DBs) plus a frame of id/content/is_review in the same row order."""
     import pandas as pd
-    
-    # 1. Fetch Reviews
-    conn_r = sqlite3.connect(DB_NAME)
+    keys, X = load_embedding_matrix(("content",))
+    df = pd.DataFrame(keys, columns=['source_table', 'id', 'content'])
+    df['is_review'] = df['source_table'] == "reviews"
+    return df.drop(columns=['source_table']), X
+
+def save_semantic_map(df, cluster_labels):
+    """Write x/y (and the labels of clusters in cluster_labels) from a load_semantic_frame df back to both DBs."""
+    for db_path, t_name in _embedding_tables():
+        part = df[df['is_review'] == (t_name == "reviews")]
+        if part.empty:
+            continue
+        # Only update cluster_label if we actually generated a new one
+        labeled = part['cluster'].isin(list(cluster_labels))
+        conn = get_connection(db_path)
+        with conn:
+            conn.executemany(
+                f"UPDATE {t_name} SET x = ?, y = ?, cluster_label = ? WHERE id = ?",
+                [(float(r.x), float(r.y), cluster_labels[r.cluster], r.id) for r in part[labeled].itertuples()]
+            )
+            conn.executemany(
+                f"UPDATE {t_name} SET x = ?, y = ? WHERE id = ?",
+                [(float(r.x), float(r.y), r.id) for r in part[~labeled].itertuples()]
+            )
+
+# --- Archive ---
+# Rows older than the horizon move, one month at a time, into ARCHIVE_DIR/YYYY-MM.db
+# (reviews, chat_messages and their mentions, in the hot DBs' layout). Each hot DB
+# keeps per-day rollups of what it moved (get_sources reads their sources) and the
+# archived ids (and content hashes), which a trigger uses to skip re-inserts, so
+# re-crawls and Discord re-imports don't bring archived rows back. Readers
+# (query_all_data, the mention readers) add an archive month's rows only when
+# the requested date range reaches it.
+ARCHIVE_HORIZON_DAYS = 180
+
+ARCHIVED_IDS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS archived_ids (
+        id TEXT PRIMARY KEY,
+        content_hash TEXT
+    )
+"""
+ARCHIVE_ROLLUPS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS archive_rollups (
+        day TEXT,
+        game_id TEXT,
+        source TEXT,
+        rows INTEGER,
+        sentiment_sum REAL,
+        sentiment_n INTEGER,
+        positive INTEGER,
+        negative INTEGER,
+        neutral INTEGER
+    )
+"""
+
+def _create_archive_tables(conn, table):
+    conn.execute(ARCHIVED_IDS_TABLE_SQL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_ids_hash ON archived_ids (content_hash)")
+    conn.execute(ARCHIVE_ROLLUPS_TABLE_SQL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_rollups_day ON archive_rollups (day)")
+    hash_check = ""
+    if table == "reviews":
+        hash_check = " OR (NEW.content_hash IS NOT NULL AND EXISTS (SELECT 1 FROM archived_ids WHERE content_hash = NEW.content_hash))"
+    # RAISE(IGNORE) drops the row like INSERT OR IGNORE does (not counted as inserted)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS skip_archived_{table} BEFORE INSERT ON {table}
+        WHEN EXISTS (SELECT 1 FROM archived_ids WHERE id = NEW.id){hash_check}
+        BEGIN SELECT RAISE(IGNORE); END
+    """)
+    conn.commit()
+
+def _archive_path(month):
+    return os.path.join(ARCHIVE_DIR, f"{month}.db")
+
+def archive_months(start_date=None, end_date=None):
+    """Paths of the archive DBs (oldest first) whose month overlaps start_date..end_date (None = open)."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    months = sorted(f[:-3] for f in os.listdir(ARCHIVE_DIR) if re.fullmatch(r"\d{4}-\d{2}\.db", f))
+    start = _date_str(start_date)[:7] if start_date else None
+    end = _date_str(end_date)[:7] if end_date else None
+    return [_archive_path(m) for m in months if (not start or m >= start) and (not end or m <= end)]
+
+def _create_archive_db(month):
+    """Create the month's archive DB (if new) with the hot DBs' table layouts; returns its path."""
+    path = _archive_path(month)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archive = sqlite3.connect(path)
     try:
-        df_r = pd.read_sql_query("SELECT * FROM reviews", conn_r)
-    except:
-        df_r = pd.DataFrame()
-    conn_r.close()
-    
-    # 2. Fetch Chats
-    conn_c = sqlite3.connect(CHAT_DB_NAME)
+        for db_path, table, date_col in ((DB_NAME, "reviews", "review_date"), (CHAT_DB_NAME, "chat_messages", "message_date")):
+            sql = get_connection(db_path).execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+            archive.execute(sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+            _create_indexes(archive, table, date_col)
+        archive.execute(MENTIONS_TABLE_SQL)
+        for sql in MENTIONS_INDEX_SQL:
+            archive.execute(sql)
+        archive.commit()
+    finally:
+        archive.close()
+    return path
+
+def _archive_month(conn, table, date_col, month, cutoff):
+    """Move one month of `table` (dated before cutoff) and its mentions to the archive. Returns rows moved."""
+    year, mon = map(int, month.split("-"))
+    month_end = f"{year + mon // 12:04d}-{mon % 12 + 1:02d}-01"
+    path = _create_archive_db(month)
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
     try:
-        df_c = pd.read_sql_query("SELECT * FROM chat_messages", conn_c)
-        if not df_c.empty:
-            # Align columns for seamless display
-            # Rename message_date to review_date so time-series charts work automatically
-            df_c = df_c.rename(columns={'message_date': 'review_date'})
-            # Add missing rating column (filled with None/0 for chats)
-            if 'rating' not in df_c.columns:
-                df_c['rating'] = 0
-    except:
-        df_c = pd.DataFrame()
-    conn_c.close()
-    
-    # 3. Concatenate
-    if df_r.empty: return df_c
-    if df_c.empty: return df_r
-    
-    return pd.concat([df_r, df_c], ignore_index=True, sort=False)
+        # Columns added to the hot table since this archive was created
+        archived = {r[1] for r in conn.execute(f"PRAGMA archive.table_info({table})")}
+        columns = []
+        for _, name, col_type, *_ in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if name not in archived:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {col_type}")
+            columns.append(name)
+        columns = ", ".join(columns)
+        hash_col = "content_hash" if table == "reviews" else "NULL"
+        moving = "(SELECT id FROM temp.archive_moving)"
+        with conn:
+            conn.execute("DELETE FROM temp.archive_moving")
+            conn.execute(f"INSERT INTO temp.archive_moving SELECT id FROM main.{table} WHERE {date_col} >= ? AND {date_col} < ?",
+                         (f"{month}-01", min(month_end, cutoff)))
+            conn.execute(f"INSERT OR IGNORE INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE id IN {moving}")
+            conn.execute(f"UPDATE archive.{table} SET embedding_row = NULL WHERE id IN {moving}")  # store rows stay behind
+            conn.execute(f"INSERT INTO archive.mentions ({MENTION_COLUMNS}) "
+                         f"SELECT {MENTION_COLUMNS} FROM main.mentions WHERE row_id IN {moving}")
+            conn.execute(f"""
+                INSERT INTO main.archive_rollups (day, game_id, source, rows, sentiment_sum, sentiment_n, positive, negative, neutral)
+                SELECT substr({date_col}, 1, 10), game_id, source, COUNT(*), SUM(sentiment_score), COUNT(sentiment_score),
+                       SUM(lower(sentiment_label) = 'positive'), SUM(lower(sentiment_label) = 'negative'),
+                       SUM(lower(sentiment_label) NOT IN ('positive', 'negative'))
+                FROM main.{table} WHERE id IN {moving} GROUP BY 1, 2, 3
+            """)
+            conn.execute(f"INSERT OR IGNORE INTO main.archived_ids (id, content_hash) SELECT id, {hash_col} FROM main.{table} WHERE id IN {moving}")
+            conn.execute(f"DELETE FROM main.mentions WHERE row_id IN {moving}")
+            moved = conn.execute(f"DELETE FROM main.{table} WHERE id IN {moving}").rowcount
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
 
-def get_all_chats():
-    conn = sqlite3.connect(CHAT_DB_NAME)
+def archive_old_rows(horizon_days=ARCHIVE_HORIZON_DAYS, vacuum=True):
+    """
+    Move rows dated before the start of the month horizon_days ago into the
+    per-month archive DBs, then VACUUM the hot DBs. Safe to re-run.
+    Returns {table: rows moved}.
+    """
+    cutoff = (datetime.date.today() - datetime.timedelta(days=horizon_days)).replace(day=1).strftime('%Y-%m-%d')
+    moved = {}
+    for db_path, table, date_col in ((DB_NAME, "reviews", "review_date"), (CHAT_DB_NAME, "chat_messages", "message_date")):
+        if not os.path.exists(db_path):
+            continue
+        conn = get_connection(db_path)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_moving (id TEXT PRIMARY KEY)")
+        months = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT substr({date_col}, 1, 7) FROM {table} "
+            f"WHERE {date_col} < ? AND {date_col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-*'", (cutoff,))]
+        before = _db_size(db_path)
+        moved[table] = sum(_archive_month(conn, table, date_col, month, cutoff) for month in sorted(months))
+        if moved[table] and vacuum:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = _db_size(db_path)
+        print(f"{table}: archived {moved[table]} rows before {cutoff} into {len(months)} month(s), "
+              f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    return moved
+
+def _fetch_with_archives(query, start_date=None, end_date=None):
+    """Rows of a content/all_mentions RowQuery from the hot DBs plus the archive months in range."""
+    rows = query.fetchall()
+    for path in archive_months(start_date, end_date):
+        rows += query.fetchall(path)
+    return rows
+
+# --- Mention Aggregates ---
+def get_mention_label_counts(kind, start_date=None, end_date=None, date_prefix=None, game_id=None, sources=None):
+    """
+    {key: {"pos", "neg", "neutral", "total"}} over hero ("hero") or aspect ("aspect")
+    mentions in both DBs, optionally filtered like query_all_data (date_prefix: e.g. one day).
+    """
+    query = RowQuery("all_mentions", "key, lower(label), COUNT(*)").where("kind = ?", kind) \
+        .game(game_id).dates(start_date, end_date).date_prefix(date_prefix).sources(sources)
+    counts = {}
+    for key, label, n in _fetch_with_archives(query.group_by("key, lower(label)"),
+                                              start_date or date_prefix, end_date or date_prefix):
+        stats = counts.setdefault(key, {"pos": 0, "neg": 0, "neutral": 0, "total": 0})
+        if label == 'positive': stats["pos"] += n
+        elif label == 'negative': stats["neg"] += n
+        else: stats["neutral"] += n
+        stats["total"] += n
+    return counts
+
+def get_mention_keys_by_row(kind, game_id=None, start_date=None, end_date=None, sources=None):
+    """DataFrame(row_id, key): each hero/aspect once per review or chat row that mentions it."""
     import pandas as pd
-    try:
-        df = pd.read_sql_query("SELECT * FROM chat_messages", conn)
-    except:
-        df = pd.DataFrame()
-    conn.close()
-    return df
+    query = RowQuery("all_mentions", "row_id, key").where("kind = ?", kind) \
+        .game(game_id).dates(start_date, end_date).sources(sources).group_by("row_id, key")
+    rows = _fetch_with_archives(query, start_date, end_date)
+    return pd.DataFrame(rows, columns=["row_id", "key"])
+
+def get_mention_items(kind, game_id=None, start_date=None, end_date=None, sources=None):
+    """DataFrame of hero/aspect items (row_id, key, dimension, seq, label, score, text, tags)."""
+    import pandas as pd
+    query = RowQuery("all_mentions", "row_id, key, dimension, seq, label, score, text, tags").where("kind = ?", kind) \
+        .game(game_id).dates(start_date, end_date).sources(sources)
+    rows = _fetch_with_archives(query, start_date, end_date)
+    return pd.DataFrame(rows, columns=["row_id", "key", "dimension", "seq", "label", "score", "text", "tags"])
+
+# --- Filtered Reads ---
+def _projection(columns):
+    """SELECT list for a column subset of the content view (None = all columns)."""
+    if not columns:
+        return "*"
+    unknown = [c for c in columns if c not in CONTENT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown content columns: {unknown}")
+    return ", ".join(columns)
+
+def query_all_data(game_id=None, start_date=None, end_date=None, sources=None, columns=None):
+    """
+    Reviews and chat messages (the `content` view: message_date as review_date,
+    rating 0 for chats), restricted to a game, date range (inclusive) and/or
+    list of sources in one SQL query, plus the archive months the range reaches.
+    columns: only load these CONTENT_COLUMNS (e.g. leave out embedding and
+    detailed_analysis, which are most of the bytes of a row).
+    """
+    query = RowQuery("content", _projection(columns)).game(game_id).dates(start_date, end_date).sources(sources)
+    df = query.to_frame()
+    archived = [a for a in (query.to_frame(path) for path in archive_months(start_date, end_date)) if not a.empty]
+    if not archived:
+        return df
+    import pandas as pd
+    return pd.concat(([df] if not df.empty else []) + archived, ignore_index=True, sort=False)
+
+def get_sources(game_id=None):
+    """Sorted distinct sources across reviews and chats (optionally for one game)."""
+    sources = {r[0] for r in RowQuery("content", "DISTINCT source").game(game_id).fetchall()}
+    for db_path in (DB_NAME, CHAT_DB_NAME):  # sources that only archived rows have
+        if os.path.exists(db_path):
+            sources |= {r[0] for r in RowQuery("archive_rollups", "DISTINCT source").game(game_id).fetchall(db_path)}
+    return sorted(s for s in sources if s is not None)
+
+def get_all_data(columns=None):
+    return query_all_data(columns=columns)
+
+def get_all_chats():
+    return RowQuery("chat_messages").to_frame(CHAT_DB_NAME)
@@ -0,0 +1,84 @@
+"""
+Reading and compacting the `detailed_analysis` JSON column.
+
+Legacy rows (v1) repeat a `metadata` dict ({source, date, full_content}) in
+every hero/aspect item, i.e. the whole review body once per matched clause.
+Compact rows (v2) keep only text/label/score(/tags) per item; the review
+reference is the row itself (id, source, date, content columns).
+
+Readers go through `load_details`, which accepts both layouts and hands back
+the legacy shape with `metadata` filled in from the row, so display code that
+does `item.get('metadata')` keeps working.
+"""
+import json
+
+DETAILS_VERSION = 2
+
+def load_details(details_json, metadata=None):
+    """
+    Parse a detailed_analysis value (v1 or v2) into {"Heroes": ..., "System": ...}.
+    metadata: the row's {source, date, full_content}, attached to v2 items.
+    Returns an empty analysis for NULL/invalid values.
+    """
+    empty = {"Heroes": {}, "System": {}}
+    if not details_json or not isinstance(details_json, str):
+        return empty
+    try:
+        data = json.loads(details_json)
+    except Exception:
+        return empty
+    if not isinstance(data, dict):
+        return empty
+
+    heroes = data.get("Heroes", {})
+    system = data.get("System", {})
+    if data.get("v", 1) >= 2 and metadata is not None:
+        for dims in heroes.values():
+            for items in dims.values():
+                for item in items:
+                    item["metadata"] = metadata
+        for items in system.values():
+            for item in items:
+                item["metadata"] = metadata
+    return {"Heroes": heroes, "System": system}
+
+def compact_details(analysis):
+    """Drop per-item metadata and tag the analysis dict as v2 (in place, returned)."""
+    for dims in analysis.get("Heroes", {}).values():
+        for items in dims.values():
+            for item in items:
+                item.pop("metadata", None)
+    for items in analysis.get("System", {}).values():
+        for item in items:
+            item.pop("metadata", None)
+    return {"v": DETAILS_VERSION, "Heroes": analysis.get("Heroes", {}), "System": analysis.get("System", {})}
+
+def compact_details_json(details_json):
+    """v1 JSON string -> v2 JSON string; None if already compact, empty or unparsable."""
+    try:
+        data = json.loads(details_json)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("v", 1) >= 2 or "System" not in data:
+        return None
+    return json.dumps(compact_details(data), ensure_ascii=False)
+
+def mention_rows(row_id, analysis, date=None, source=None, game_id=None):
+    """
+    Flatten an analysis dict into `mentions` table rows:
+    (row_id, kind, key, dimension, seq, label, score, text, tags, date, source, game_id).
+    kind is "hero" (key = hero code, dimension = General/Skill/...) or
+    "aspect" (key = GAME_ASPECTS name, tags = comma-joined mode tags).
+    seq keeps the item order of the JSON.
+    """
+    rows = []
+    for hero, dims in analysis.get("Heroes", {}).items():
+        for dim, items in dims.items():
+            for item in items:
+                rows.append((row_id, "hero", hero, dim, len(rows), item["label"], item["score"],
+                             item["text"], None, date, source, game_id))
+    for aspect, items in analysis.get("System", {}).items():
+        for item in items:
+            rows.append((row_id, "aspect", aspect, None, len(rows), item["label"], item["score"],
+                         item["text"], ",".join(item.get("tags", [])), date, source, game_id))
+    return rows
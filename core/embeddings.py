@@ -0,0 +1,149 @@
+"""
+Embedding storage: the `embedding` BLOB format and the memory-mapped store.
+
+BLOB layout (v1), all little-endian:
+    b"EMB1" | uint32 dim | uint16 len(model) | model (utf-8) | dim x float32
+so a row decodes with one np.frombuffer and never goes through pickle.
+Older rows hold `pickle.dumps(np.ndarray)`; `pickled_embedding` reads the raw
+float32 buffer out of those pickles without executing them (used by the
+one-off conversion in core.db).
+
+EmbeddingStore is an append-only arena file holding every embedding of both
+DBs as one N x dim float32 matrix behind a 64-byte header, opened with
+np.memmap. Which arena row belongs to which review/message is recorded in the
+DBs (`embedding_row` column); core.db writes both together.
+"""
+import os
+import struct
+import pickletools
+import numpy as np
+
+EMBEDDING_MAGIC = b"EMB1"
+_BLOB_HEADER = struct.Struct("<4sIH")  # magic, dim, model name length
+
+ARENA_MAGIC = b"EMBA"
+ARENA_VERSION = 1
+ARENA_HEADER_SIZE = 64
+_ARENA_HEADER = struct.Struct("<4sHI")  # magic, version, dim; model name fills the rest
+MAX_MODEL_NAME = ARENA_HEADER_SIZE - _ARENA_HEADER.size
+
+FLOAT32 = np.dtype("<f4")
+
+def as_float32_matrix(vectors):
+    """List of vectors (lists or arrays) -> contiguous (n, dim) little-endian float32 array."""
+    matrix = np.ascontiguousarray(vectors, dtype=FLOAT32)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a list of equal-length vectors, got shape {matrix.shape}")
+    return matrix
+
+def pack_embedding(vector, model=""):
+    """One vector -> embedding BLOB (header + raw float32)."""
+    data = np.ascontiguousarray(vector, dtype=FLOAT32).ravel()
+    name = (model or "").encode("utf-8")
+    return _BLOB_HEADER.pack(EMBEDDING_MAGIC, len(data), len(name)) + name + data.tobytes()
+
+def embedding_header(blob):
+    """(model, dim, data_offset) of a v1 BLOB, or None for anything else (legacy pickles, NULL)."""
+    if not blob or len(blob) < _BLOB_HEADER.size:
+        return None
+    magic, dim, name_len = _BLOB_HEADER.unpack_from(blob)
+    if magic != EMBEDDING_MAGIC:
+        return None
+    offset = _BLOB_HEADER.size + name_len
+    if len(blob) != offset + dim * FLOAT32.itemsize:
+        return None
+    return bytes(blob[_BLOB_HEADER.size:offset]).decode("utf-8", "replace"), dim, offset
+
+def unpack_embedding(blob):
+    """(model, float32 vector) of a v1 BLOB (vector is a read-only view of the BLOB), or None."""
+    header = embedding_header(blob)
+    if header is None:
+        return None
+    model, dim, offset = header
+    return model, np.frombuffer(blob, dtype=FLOAT32, count=dim, offset=offset)
+
+def pickled_embedding(blob):
+    """
+    float32 vector stored in a legacy `pickle.dumps(np.float32 array)` BLOB, or None.
+    Walks the opcode stream with pickletools instead of unpickling, so nothing
+    in the DB gets executed: the array data is the one bytes argument whose
+    length is a multiple of 4, next to an 'f4' dtype with '<' (or '|') order.
+    """
+    try:
+        ops = [(op.name, arg) for op, arg, _ in pickletools.genops(bytes(blob))]
+    except Exception:
+        return None
+    strings = {arg for _, arg in ops if isinstance(arg, str)}
+    buffers = [arg for _, arg in ops if isinstance(arg, (bytes, bytearray))]
+    if ("GLOBAL", "_codecs encode") in ops:
+        # Protocol 2 has no bytes opcode: bytes go in as _codecs.encode(str, 'latin1')
+        buffers += [arg.encode("latin1", "replace") for name, arg in ops
+                    if name.endswith("UNICODE") and arg not in ("b", "latin1", "f4", "<", "|")]
+    buffers = [b for b in buffers if len(b) % FLOAT32.itemsize == 0]
+    if "f4" not in strings or ">" in strings or len(buffers) != 1 or not buffers[0]:
+        return None
+    return np.frombuffer(bytes(buffers[0]), dtype=FLOAT32)
+
+class EmbeddingStore:
+    """
+    Append-only float32 arena: header (dim, model), then one row per embedding.
+    Rows are never rewritten; re-embedding a review appends a new row and the
+    old one stays as dead space until the store is rebuilt. A row cut short by
+    an interrupted append is dropped on the next append.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.dim, self.model = self._read_header()
+
+    def _read_header(self):
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read(ARENA_HEADER_SIZE)
+        except OSError:
+            return None, None
+        if len(raw) < ARENA_HEADER_SIZE:
+            return None, None
+        magic, version, dim = _ARENA_HEADER.unpack_from(raw)
+        if magic != ARENA_MAGIC or version != ARENA_VERSION or not dim:
+            return None, None
+        return dim, raw[_ARENA_HEADER.size:].rstrip(b"\0").decode("utf-8", "replace")
+
+    @property
+    def row_bytes(self):
+        return self.dim * FLOAT32.itemsize
+
+    def __len__(self):
+        if self.dim is None:
+            return 0
+        return max(os.path.getsize(self.path) - ARENA_HEADER_SIZE, 0) // self.row_bytes
+
+    def compatible(self, dim, model):
+        """Can vectors of this dim/model share the matrix? (an empty model name matches any)"""
+        return self.dim == dim and (not self.model or not model or self.model == model)
+
+    def reset(self, dim, model):
+        """Start an empty arena for dim/model (existing rows are discarded)."""
+        name = (model or "").encode("utf-8")[:MAX_MODEL_NAME]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(_ARENA_HEADER.pack(ARENA_MAGIC, ARENA_VERSION, dim) + name.ljust(MAX_MODEL_NAME, b"\0"))
+        self.dim, self.model = dim, name.decode("utf-8", "replace")
+
+    def append(self, matrix):
+        """Append an (n, dim) float32 matrix; returns the row index of its first row."""
+        matrix = as_float32_matrix(matrix)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding store holds dim {self.dim}, got {matrix.shape[1]}")
+        first = len(self)
+        with open(self.path, "r+b") as f:
+            f.seek(ARENA_HEADER_SIZE + first * self.row_bytes)
+            f.write(matrix.tobytes())
+            f.truncate()
+        return first
+
+    def matrix(self):
+        """Read-only (len, dim) memmap over the arena (no copy; empty array if there are no rows)."""
+        n = len(self)
+        if not n:
+            return np.empty((0, self.dim or 0), dtype=FLOAT32)
+        return np.memmap(self.path, dtype=FLOAT32, mode="r", offset=ARENA_HEADER_SIZE, shape=(n, self.dim))
@@ -31,6 +31,7 @@ client = genai.Client(api_key=current_key) if current_key else None
 last_successful_model = 'gemini-2.0-flash'
 last_model_failure_time = 0
 FAILURE_COOLDOWN = 300 # 5 minutes cooldown for a failing model
+EMBEDDING_MODEL = 'gemini-embedding-001'
 
 def rotate_key():
     """Switch to the next available API key and rebuild client."""
@@ -56,7 +57,7 @@ def get_embeddings(texts):
         for _ in range(attempts):
             try:
                 result = client.models.embed_content(
-                    model='gemini-embedding-001',
+                    model=EMBEDDING_MODEL,
                     contents=texts,
                     config=types.EmbedContentConfig(task_type="CLUSTERING")
                 )
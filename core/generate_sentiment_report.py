@@ -1,23 +1,19 @@
 
-import sqlite3
 import pandas as pd
-import json
 import collections
 import jieba
 import os
 import re
 import datetime
+from core.db import get_mention_label_counts, query_all_data, init_db
 
 # Project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Database paths
-DB_PATH = os.path.join(BASE_DIR, 'data', 'jump_reviews.db')
-CHAT_DB_PATH = os.path.join(BASE_DIR, 'data', 'jump_chats.db')
-
 # Configuration: Default to the first day of the current month
 START_DATE = datetime.datetime.now().replace(day=1).strftime('%Y-%m-%d')
 END_DATE = None  # Set to None for "until now"
+REPORT_COLUMNS = ("review_date", "sentiment_score", "sentiment_label", "content", "source", "cluster_label")
 
 def load_stopwords():
     stop_path = os.path.join(BASE_DIR, 'config', 'stopwords.txt')
@@ -28,37 +24,10 @@ def load_stopwords():
 
 def load_aggregate_data():
     """Unify data from reviews and chat messages."""
-    date_filter = f"review_date >= '{START_DATE}'"
-    if END_DATE:
-        date_filter += f" AND review_date <= '{END_DATE}'"
-        
-    # 1. Load Reviews
-    conn_r = sqlite3.connect(DB_PATH)
-    query_r = f"SELECT * FROM reviews WHERE {date_filter}"
-    df_r = pd.read_sql_query(query_r, conn_r)
-    conn_r.close()
-    
-    # 2. Load Chats
-    df_c = pd.DataFrame()
-    if os.path.exists(CHAT_DB_PATH):
-        conn_c = sqlite3.connect(CHAT_DB_PATH)
-        # For chats, the filter is on message_date
-        c_filter = f"message_date >= '{START_DATE}'"
-        if END_DATE:
-            c_filter += f" AND message_date <= '{END_DATE}'"
-        query_c = f"SELECT * FROM chat_messages WHERE {c_filter}"
-        try:
-            df_c = pd.read_sql_query(query_c, conn_c)
-            if not df_c.empty:
-                df_c = df_c.rename(columns={'message_date': 'review_date'})
-                df_c['rating'] = 0 # Default for chats
-        except: pass
-        conn_c.close()
-    
-    if df_r.empty and df_c.empty:
-        return pd.DataFrame()
-        
-    return pd.concat([df_r, df_c], ignore_index=True, sort=False)
+    init_db()  # the content view and mentions table need an up-to-date schema
+    # One query over the unified `content` view (chats have message_date as review_date),
+    # only the columns the report uses
+    return query_all_data(start_date=START_DATE, end_date=END_DATE, columns=REPORT_COLUMNS)
 
 def generate_report():
     df = load_aggregate_data()
@@ -79,42 +48,9 @@ def generate_report():
     avg_sentiment = df['sentiment_score'].mean()
     sentiment_counts = df['sentiment_label'].value_counts().to_dict()
 
-    # Aspect analysis aggregation
-    aspect_feedback = {}
-    hero_feedback = {}
-
-    for _, row in df.iterrows():
-        if pd.isna(row['detailed_analysis']):
-            continue
-        try:
-            analysis = json.loads(row['detailed_analysis'])
-            
-            # System Aspects
-            system = analysis.get("System", {})
-            for aspect, items in system.items():
-                if aspect not in aspect_feedback:
-                    aspect_feedback[aspect] = {"pos": 0, "neg": 0, "neutral": 0, "total": 0}
-                for item in items:
-                    label = item['label'].lower()
-                    if label == 'positive': aspect_feedback[aspect]["pos"] += 1
-                    elif label == 'negative': aspect_feedback[aspect]["neg"] += 1
-                    else: aspect_feedback[aspect]["neutral"] += 1
-                    aspect_feedback[aspect]["total"] += 1
-
-            # Hero Aspects
-            heroes = analysis.get("Heroes", {})
-            for hero, dims in heroes.items():
-                if hero not in hero_feedback:
-                    hero_feedback[hero] = {"pos": 0, "neg": 0, "neutral": 0, "total": 0}
-                for dim, items in dims.items():
-                    for item in items:
-                        label = item['label'].lower()
-                        if label == 'positive': hero_feedback[hero]["pos"] += 1
-                        elif label == 'negative': hero_feedback[hero]["neg"] += 1
-                        else: hero_feedback[hero]["neutral"] += 1
-                        hero_feedback[hero]["total"] += 1
-        except:
-            continue
+    # Aspect analysis aggregation (GROUP BY over the mentions table)
+    aspect_feedback = get_mention_label_counts("aspect", start_date=START_DATE, end_date=END_DATE)
+    hero_feedback = get_mention_label_counts("hero", start_date=START_DATE, end_date=END_DATE)
 
     # Word Frequency
     stopwords = load_stopwords()
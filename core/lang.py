@@ -0,0 +1,45 @@
+"""
+Shared script/language detection.
+
+Analysis needs to know whether a text is Chinese, Thai or plain (English/other
+Latin) before choosing a tokenizer or sentiment path. `detect_language`
+classifies a text once with precompiled patterns so callers can pass the result
+around instead of regex-scanning the same string again. The web UI tokenizer
+shares the precompiled patterns.
+"""
+import re
+
+ZH = "zh"
+TH = "th"
+EN = "en"
+MIXED = "mixed"  # contains both Chinese and Thai
+
+# CJK Unified Ideographs (the basic block used across the project)
+ZH_PATTERN = re.compile(r'[\u4e00-\u9fa5]')
+# The whole block, up to \u9fff: the word-cloud tokenizer picks jieba on any of it
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+TH_PATTERN = re.compile(r'[\u0E00-\u0E7F]')
+TH_RUN_PATTERN = re.compile(r'[\u0E00-\u0E7F]+')
+EN_WORD_PATTERN = re.compile(r'\b[a-z]{2,}\b')
+NUMERIC_PATTERN = re.compile(r'^[0-9.]+$')
+
+# One alternation finds the first Chinese or Thai character in a single scan
+_SCRIPT_PATTERN = re.compile(r'([\u4e00-\u9fa5])|[\u0E00-\u0E7F]')
+
+def detect_language(text):
+    """Return ZH, TH, MIXED or EN for `text` (EN also covers empty text)."""
+    if not text:
+        return EN
+    m = _SCRIPT_PATTERN.search(text)
+    if m is None:
+        return EN
+    # Only the remainder after the first hit needs checking for the other script
+    if m.group(1):
+        return MIXED if TH_PATTERN.search(text, m.end()) else ZH
+    return MIXED if ZH_PATTERN.search(text, m.end()) else TH
+
+def has_chinese(lang):
+    return lang == ZH or lang == MIXED
+
+def has_thai(lang):
+    return lang == TH or lang == MIXED
@@ -0,0 +1,105 @@
+"""
+Multi-pattern keyword matching (Aho-Corasick).
+
+Uses the `pyahocorasick` C extension when it is installed and falls back to a
+pure-Python automaton otherwise. Both report every pattern that occurs in the
+text, including overlapping ones (e.g. "垃圾" and "垃圾公司"), in a single pass.
+`find_outermost` instead drops matches nested inside a longer match, so a long
+alias such as "孙悟空（超一）" hides the "悟空" inside it, while two aliases that
+only partly overlap are both kept.
+"""
+try:
+    import ahocorasick
+    HAS_PYAHOCORASICK = True
+except ImportError:
+    HAS_PYAHOCORASICK = False
+
+
+class KeywordAutomaton:
+    """Compiled set of substring patterns. Build once, match many texts."""
+
+    def __init__(self, patterns):
+        # Keep first-seen order, drop empties and duplicates
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+
+        if HAS_PYAHOCORASICK:
+            self._automaton = ahocorasick.Automaton()
+            for p in self.patterns:
+                self._automaton.add_word(p, p)
+            if self.patterns:
+                self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._build_fallback()
+
+    def _build_fallback(self):
+        # goto[state] = {char: next_state}, fail[state] = state, out[state] = (patterns,)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for p in self.patterns:
+            state = 0
+            for ch in p:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (p,)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for state in queue:
+                for ch, nxt in self._goto[state].items():
+                    f = self._fail[state]
+                    while f and ch not in self._goto[f]:
+                        f = self._fail[f]
+                    target = self._goto[f].get(ch, 0)
+                    self._fail[nxt] = target if target != nxt else 0
+                    if self._out[self._fail[nxt]]:
+                        self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                    next_queue.append(nxt)
+            queue = next_queue
+
+    def _iter_matches(self, text):
+        """Yield (end_index, pattern) for every occurrence, overlapping ones included."""
+        if self._automaton is not None:
+            yield from self._automaton.iter(text)
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for p in out[state]:
+                yield i, p
+
+    def findall(self, text):
+        """Return the set of patterns that occur anywhere in `text`."""
+        if not text or not self.patterns:
+            return set()
+        return {p for _, p in self._iter_matches(text)}
+
+    def find_outermost(self, text):
+        """Return the matches not contained in another match, in text order."""
+        if not text or not self.patterns:
+            return []
+
+        # Sorted by start, longest first: a span is nested iff an earlier one reaches as far
+        spans = sorted((end + 1 - len(p), -len(p), p) for end, p in self._iter_matches(text))
+        found = []
+        reach = 0
+        for start, neg_len, p in spans:
+            end = start - neg_len
+            if end > reach:
+                found.append(p)
+                reach = end
+        return found
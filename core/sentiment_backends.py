@@ -0,0 +1,130 @@
+"""
+Pluggable document-level sentiment scorers.
+
+Every backend implements `score_batch(texts) -> [(score, label)]`. The rules
+engine (SnowNLP + game lexicons) is the default. `local_llm` sends many texts
+per request to the local llama-server already used for embeddings in
+scripts/process_local_gemma.py. Pick one with SENTIMENT_BACKEND in .env.
+"""
+import json
+import re
+import urllib.request
+
+from config.settings import SENTIMENT_BACKEND, LOCAL_LLM_URL
+
+BACKENDS = {}
+_instances = {}
+
+def register_backend(name):
+    """Class decorator: make a backend selectable by name."""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def get_backend(name=None):
+    """Shared backend instance; defaults to SENTIMENT_BACKEND from settings."""
+    name = name or SENTIMENT_BACKEND
+    if name not in BACKENDS:
+        print(f"Unknown sentiment backend '{name}', falling back to 'rules'.")
+        name = "rules"
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+def score_to_label(score):
+    if score > 0.51:
+        return "Positive"
+    elif score < 0.49:
+        return "Negative"
+    return "Neutral"
+
+
+class SentimentBackend:
+    # Batched backends are called once per chunk by the analysis pipeline
+    batched = False
+
+    def score_batch(self, texts):
+        raise NotImplementedError
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+
+@register_backend("rules")
+class RulesBackend(SentimentBackend):
+    """SnowNLP + rule engine from core.analysis (whole texts, so not through the clause cache)."""
+
+    def score_batch(self, texts):
+        from core.analysis import analyze_sentiment
+        return [analyze_sentiment(t) for t in texts]
+
+
+@register_backend("local_llm")
+class LocalLLMBackend(SentimentBackend):
+    """
+    Scores texts with the local llama-server, `batch_size` texts per HTTP request.
+    Any batch the server fails on (or answers with the wrong length) is scored by
+    the rules engine instead, so a run never stalls on the model.
+    """
+    batched = True
+
+    def __init__(self, server_url=None, batch_size=32, timeout=120, model="gemma-4"):
+        self.endpoint = f"{(server_url or LOCAL_LLM_URL).rstrip('/')}/v1/chat/completions"
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.model = model
+        self.fallback = RulesBackend()
+
+    def _build_prompt(self, texts):
+        return (
+            "你是一个游戏舆情分析员。请判断下列每条玩家评论的情感倾向，给出 0 到 1 之间的分数"
+            "（0=极度负面，0.5=中性，1=极度正面）。\n"
+            "要求：仅输出一个 JSON 数字数组，长度与输入一致、顺序一致，不要任何解释。\n"
+            f"TEXTS_JSON: {json.dumps([t[:500] for t in texts], ensure_ascii=False)}"
+        )
+
+    def _request(self, texts):
+        payload = json.dumps({
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "你是一个专业的游戏分析助手。"},
+                {"role": "user", "content": self._build_prompt(texts)}
+            ],
+            "temperature": 0.0,
+            "max_tokens": 16 * len(texts) + 32
+        }).encode("utf-8")
+        req = urllib.request.Request(
+            self.endpoint,
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            result = json.loads(resp.read().decode())
+        content = result["choices"][0]["message"]["content"]
+        match = re.search(r'\[.*?\]', content, re.S)
+        scores = json.loads(match.group(0)) if match else []
+        if len(scores) != len(texts):
+            raise ValueError(f"expected {len(texts)} scores, got {len(scores)}")
+        return [max(0.0, min(1.0, float(s))) for s in scores]
+
+    def score_batch(self, texts):
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            # Empty texts never reach the model
+            idx = [j for j, t in enumerate(batch) if t and t.strip()]
+            scored = [(0.5, "Neutral")] * len(batch)
+            if idx:
+                try:
+                    scores = self._request([batch[j] for j in idx])
+                    for j, s in zip(idx, scores):
+                        scored[j] = (round(s, 3), score_to_label(s))
+                except Exception as e:
+                    print(f"❌ Local LLM scoring failed ({e}), using rules for {len(idx)} texts.")
+                    for j, r in zip(idx, self.fallback.score_batch([batch[j] for j in idx])):
+                        scored[j] = r
+            results.extend(scored)
+        return results
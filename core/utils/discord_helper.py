@@ -3,7 +3,9 @@ import os
 import re
 import datetime
 import hashlib
-from core.db import save_chat_message, init_db
+from core.db import save_chat_message, save_chat_messages_bulk, init_db
+
+BATCH_SIZE = 500
 
 def clean_discord_content(content):
     # Remove Discord Emojis/Stickers: <:name:id>
@@ -25,8 +27,29 @@ def import_discord_files(directory="data/discord", game_id="jump_assemble"):
         return 0
 
     total_imported = 0
+    inserted = duplicates = failed = 0
+    batch = []
     print(f"  [discord] Found {len(files)} files to process.")
 
+    def flush():
+        nonlocal inserted, duplicates, failed
+        try:
+            new, dup = save_chat_messages_bulk(batch)
+            inserted += new
+            duplicates += dup
+        except Exception as e:
+            # One bad message shouldn't cost the whole batch (or the rest of the import)
+            print(f"  [discord] Error saving {len(batch)} messages in bulk ({e}), saving one by one...")
+            for msg in batch:
+                saved = save_chat_message(msg)
+                if saved:
+                    inserted += 1
+                elif saved is False:
+                    duplicates += 1
+                else:
+                    failed += 1
+        batch.clear()
+
     for filename in files:
         filepath = os.path.join(directory, filename)
         channel_name = filename.replace('.txt', '')
@@ -47,8 +70,10 @@ def import_discord_files(directory="data/discord", game_id="jump_assemble"):
                     raw_id = f"{current_msg['author']}{current_msg['message_date']}{current_msg['content']}"
                     current_msg['id'] = hashlib.md5(raw_id.encode('utf-8')).hexdigest()[:16]
                     
-                    save_chat_message(current_msg)
+                    batch.append(current_msg)
                     total_imported += 1
+                    if len(batch) >= BATCH_SIZE:
+                        flush()
                     current_msg = None
                 continue
 
@@ -81,8 +106,10 @@ def import_discord_files(directory="data/discord", game_id="jump_assemble"):
         if current_msg and "使用export" not in current_msg['content'] and current_msg['content']:
             raw_id = f"{current_msg['author']}{current_msg['message_date']}{current_msg['content']}"
             current_msg['id'] = hashlib.md5(raw_id.encode('utf-8')).hexdigest()[:16]
-            save_chat_message(current_msg)
+            batch.append(current_msg)
             total_imported += 1
 
-    print(f"  [discord] Successfully imported {total_imported} messages.")
+    flush()
+    print(f"  [discord] Successfully imported {total_imported} messages ({inserted} new, {duplicates} already stored"
+          + (f", {failed} failed" if failed else "") + ").")
     return total_imported
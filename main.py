@@ -7,9 +7,20 @@ import argparse
 # Ensure core modules can be imported
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from core.analysis import run_all_analysis
-from core.crawler import run_crawler
-from core.generate_sentiment_report import generate_report
+# Mode-specific modules (NLP stack, Playwright, pandas) are imported by the
+# helpers below only when that mode runs, so e.g. `crawl` never loads SnowNLP.
+
+def run_all_analysis(*args, **kwargs):
+    from core.analysis import run_all_analysis as _run_all_analysis
+    return _run_all_analysis(*args, **kwargs)
+
+def run_crawler(*args, **kwargs):
+    from core.crawler import run_crawler as _run_crawler
+    return _run_crawler(*args, **kwargs)
+
+def generate_report(*args, **kwargs):
+    from core.generate_sentiment_report import generate_report as _generate_report
+    return _generate_report(*args, **kwargs)
 
 def run_web_ui():
     print("Starting Web UI...")
@@ -53,23 +64,41 @@ def start_interactive_menu():
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Sentiment Analysis Tool Entry Point")
-    parser.add_argument("mode", nargs="?", help="Mode: web, crawl, analyze, report")
+    parser.add_argument("mode", nargs="?", help="Mode: web, crawl, analyze, report, migrate, archive")
     parser.add_argument("--game", default="jump_assemble", help="Game ID for crawl/analyze")
     parser.add_argument("--days", default=None, type=int, help="Days history for crawler (overrides settings)")
     parser.add_argument("--source", default=None, help="Filter crawler by source URL (e.g., 'bahamut', 'youtube')")
     parser.add_argument("--force", action="store_true", help="Force re-analysis of all data")
+    parser.add_argument("--workers", default=1, type=int, help="Number of analysis worker processes")
+    parser.add_argument("--stale", action="store_true", help="Re-analyze only rows analyzed by an older analyzer/config")
+    parser.add_argument("--horizon", default=None, type=int, help="Days of data to keep in the hot DBs when archiving (default 180)")
 
     args = parser.parse_args()
+
+    # Close the pooled DB connections on exit; the last close also checkpoints the WAL
+    import atexit
+    from core.db import close_connections
+    atexit.register(close_connections)
     
     if args.mode == "web":
         run_web_ui()
     elif args.mode == "crawl":
         run_crawler(args.game, days_back=args.days, source_filter=args.source)
     elif args.mode == "analyze":
-        run_all_analysis(args.game, force=args.force)
+        run_all_analysis(args.game, force=args.force, workers=args.workers, stale=args.stale)
         print("Updating monthly report...")
         generate_report()
     elif args.mode == "report":
         generate_report()
+    elif args.mode == "migrate":
+        from core.db import init_db, migrate_compact_details, rebuild_embedding_store, remove_duplicate_reviews
+        init_db()
+        remove_duplicate_reviews()
+        migrate_compact_details()
+        rebuild_embedding_store()
+    elif args.mode == "archive":
+        from core.db import init_db, archive_old_rows, ARCHIVE_HORIZON_DAYS
+        init_db()
+        archive_old_rows(args.horizon or ARCHIVE_HORIZON_DAYS)
     else:
         start_interactive_menu()
@@ -1,7 +1,5 @@
 
-import sqlite3
 import pandas as pd
-import json
 import collections
 import jieba
 import os
@@ -13,40 +11,16 @@ import sys
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
-from core.generate_sentiment_report import load_stopwords, DB_PATH, CHAT_DB_PATH
+from core.generate_sentiment_report import load_stopwords, REPORT_COLUMNS
+from core.db import get_mention_label_counts, query_all_data, init_db
 
 # Set date to today
 TODAY = "2026-04-15"
 
 def load_today_data():
     """Unify data from reviews and chat messages for today."""
-    
-    # 1. Load Reviews
-    conn_r = sqlite3.connect(DB_PATH)
-    query_r = f"SELECT * FROM reviews WHERE review_date LIKE '{TODAY}%'"
-    df_r = pd.read_sql_query(query_r, conn_r)
-    conn_r.close()
-    
-    # 2. Load Chats
-    df_c = pd.DataFrame()
-    if os.path.exists(CHAT_DB_PATH):
-        conn_c = sqlite3.connect(CHAT_DB_PATH)
-        query_c = f"SELECT * FROM chat_messages WHERE message_date LIKE '{TODAY}%'"
-        try:
-            df_c = pd.read_sql_query(query_c, conn_c)
-            if not df_c.empty:
-                # Standardize columns
-                if 'message_date' in df_c.columns:
-                    df_c = df_c.rename(columns={'message_date': 'review_date'})
-                if 'rating' not in df_c.columns:
-                    df_c['rating'] = 0 
-        except: pass
-        conn_c.close()
-    
-    if df_r.empty and df_c.empty:
-        return pd.DataFrame()
-        
-    return pd.concat([df_r, df_c], ignore_index=True, sort=False)
+    init_db()
+    return query_all_data(start_date=TODAY, end_date=TODAY, columns=REPORT_COLUMNS)
 
 def generate_today_report():
     df = load_today_data()
@@ -60,36 +34,8 @@ def generate_today_report():
     avg_sentiment = df['sentiment_score'].mean()
     sentiment_counts = df['sentiment_label'].value_counts().to_dict()
 
-    aspect_feedback = {}
-    hero_feedback = {}
-
-    for _, row in df.iterrows():
-        if pd.isna(row['detailed_analysis']): continue
-        try:
-            analysis = json.loads(row['detailed_analysis'])
-            system = analysis.get("System", {})
-            for aspect, items in system.items():
-                if aspect not in aspect_feedback:
-                    aspect_feedback[aspect] = {"pos": 0, "neg": 0, "neutral": 0, "total": 0}
-                for item in items:
-                    label = item['label'].lower()
-                    if label == 'positive': aspect_feedback[aspect]["pos"] += 1
-                    elif label == 'negative': aspect_feedback[aspect]["neg"] += 1
-                    else: aspect_feedback[aspect]["neutral"] += 1
-                    aspect_feedback[aspect]["total"] += 1
-
-            heroes = analysis.get("Heroes", {})
-            for hero, dims in heroes.items():
-                if hero not in hero_feedback:
-                    hero_feedback[hero] = {"pos": 0, "neg": 0, "neutral": 0, "total": 0}
-                for dim, items in dims.items():
-                    for item in items:
-                        label = item['label'].lower()
-                        if label == 'positive': hero_feedback[hero]["pos"] += 1
-                        elif label == 'negative': hero_feedback[hero]["neg"] += 1
-                        else: hero_feedback[hero]["neutral"] += 1
-                        hero_feedback[hero]["total"] += 1
-        except: continue
+    aspect_feedback = get_mention_label_counts("aspect", date_prefix=TODAY)
+    hero_feedback = get_mention_label_counts("hero", date_prefix=TODAY)
 
     # Word Frequency
     stopwords = load_stopwords()
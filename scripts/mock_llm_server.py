@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Offline stand-in for llama-server's /v1/chat/completions, used to exercise the
+# "local_llm" sentiment backend without a model. It answers the batched scoring
+# prompt with the rules-engine scores, so results line up with the default backend.
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+        prompt = body["messages"][-1]["content"]
+        match = re.search(r'TEXTS_JSON: (\[.*\])', prompt, re.S)
+        texts = json.loads(match.group(1)) if match else []
+
+        from core.analysis import analyze_sentiment
+        scores = [analyze_sentiment(t)[0] for t in texts]
+
+        reply = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": json.dumps(scores)}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def start_mock_server(port=0):
+    """Start the mock in a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockCompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockCompletionsHandler)
+    print(f"Mock llama-server listening on http://127.0.0.1:{port} (Ctrl+C to stop)")
+    print(f"Run analysis against it with SENTIMENT_BACKEND=local_llm LOCAL_LLM_URL=http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
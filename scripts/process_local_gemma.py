@@ -1,10 +1,6 @@
 import os
 import sys
-import sqlite3
-import numpy as np
-import pandas as pd
 import json
-import pickle
 import time
 import urllib.request
 import urllib.error
@@ -13,12 +9,13 @@ from sklearn.cluster import KMeans
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from core.db import DB_NAME, CHAT_DB_NAME
+from core.db import DB_NAME, CHAT_DB_NAME, RowQuery, init_db, save_embeddings, load_semantic_frame, save_semantic_map
 
 # ─── Configuration ───
 SERVER_URL = "http://127.0.0.1:8080"
 EMBEDDINGS_ENDPOINT = f"{SERVER_URL}/v1/embeddings"
 COMPLETIONS_ENDPOINT = f"{SERVER_URL}/v1/chat/completions"
+EMBEDDING_MODEL = "gemma-4"
 
 def get_embeddings_local(texts):
     """Fetch vector embeddings via local llama-server."""
@@ -30,7 +27,7 @@ def get_embeddings_local(texts):
 
     # llama-server uses OpenAI format
     payload = json.dumps({
-        "model": "gemma-4",
+        "model": EMBEDDING_MODEL,
         "input": valid_texts
     }).encode("utf-8")
 
@@ -102,25 +99,14 @@ def summarize_cluster_local(content_text):
 
 def update_embeddings_batch(batch_size=50):
     """Fetch rows without embeddings from both DBs and generate them locally."""
-    # Check Reviews DB
-    conn_r = sqlite3.connect(DB_NAME)
-    c_r = conn_r.cursor()
-    c_r.execute("SELECT id, content FROM reviews WHERE embedding IS NULL AND content IS NOT NULL AND content != '' LIMIT ?", (batch_size,))
-    rows = c_r.fetchall()
-    
-    if rows:
-        db_conn, table_name, cursor = conn_r, "reviews", c_r
+    # Check Reviews DB, fall back to Chats DB
+    for db_path, table_name in ((DB_NAME, "reviews"), (CHAT_DB_NAME, "chat_messages")):
+        rows = RowQuery(table_name, "id, content") \
+            .where("embedding IS NULL AND content IS NOT NULL AND content != ''").limit(batch_size).fetchall(db_path)
+        if rows:
+            break
     else:
-        conn_r.close()
-        # Fallback to Chats DB
-        conn_c = sqlite3.connect(CHAT_DB_NAME)
-        c_c = conn_c.cursor()
-        c_c.execute("SELECT id, content FROM chat_messages WHERE embedding IS NULL AND content IS NOT NULL AND content != '' LIMIT ?", (batch_size,))
-        rows = c_c.fetchall()
-        if not rows:
-            conn_c.close()
-            return 0
-        db_conn, table_name, cursor = conn_c, "chat_messages", c_c
+        return 0
 
     ids = [r[0] for r in rows]
     texts = [r[1] for r in rows]
@@ -129,44 +115,29 @@ def update_embeddings_batch(batch_size=50):
     embeddings = get_embeddings_local(texts)
     
     if embeddings:
-        for rid, emb in zip(ids, embeddings):
-            # Same format as original: binary pickle of numpy array
-            emb_blob = pickle.dumps(np.array(emb, dtype=np.float32))
-            cursor.execute(f"UPDATE {table_name} SET embedding = ? WHERE id = ?", (emb_blob, rid))
-        db_conn.commit()
+        # Same format as process_semantic.py: float32 BLOBs + embedding store rows
+        save_embeddings(db_path, table_name, ids, embeddings, model=EMBEDDING_MODEL)
         print(f"Successfully processed {len(ids)} embeddings.")
-        db_conn.close()
         return len(ids)
     
-    db_conn.close()
     return 0
 
 def run_semantic_clustering(n_clusters=40):
     """Execute T-SNE and KMeans, then label clusters using Local Gemma."""
-    # 1. Fetch data from both databases
-    conn_r = sqlite3.connect(DB_NAME)
-    df_r = pd.read_sql_query("SELECT id, content, embedding FROM reviews WHERE embedding IS NOT NULL", conn_r)
-    df_r['is_review'] = True
-    
-    conn_c = sqlite3.connect(CHAT_DB_NAME)
-    df_c = pd.read_sql_query("SELECT id, content, embedding FROM chat_messages WHERE embedding IS NOT NULL", conn_c)
-    df_c['is_review'] = False
+    # 1. One float32 matrix for both DBs, straight from the embedding store
+    df, X = load_semantic_frame()
     
-    if df_r.empty and df_c.empty:
+    if df.empty:
         print("No embeddings found in either database.")
-        conn_r.close(); conn_c.close()
         return
 
-    df = pd.concat([df_r, df_c], ignore_index=True)
     if len(df) < n_clusters:
         print(f"Not enough data for clustering (need at least {n_clusters}).")
-        conn_r.close(); conn_c.close()
         return
 
     print(f"Running clustering on {len(df)} records...")
     
     # 2. X, Y Calculation (T-SNE)
-    X = np.array([pickle.loads(e) for e in df['embedding'].values])
     tsne = TSNE(n_components=2, perplexity=min(30, len(df)-1), random_state=42, init='pca', learning_rate='auto')
     coords = tsne.fit_transform(X)
     
@@ -192,29 +163,12 @@ def run_semantic_clustering(n_clusters=40):
             cluster_labels[i] = label
             
     # 5. Save back to DBs
-    for _, row in df.iterrows():
-        is_rev = row['is_review']
-        conn = conn_r if is_rev else conn_c
-        t_name = "reviews" if is_rev else "chat_messages"
-        c = conn.cursor()
-        
-        # Consistent with process_semantic.py logic
-        if row['cluster'] in cluster_labels:
-            c.execute(
-                f"UPDATE {t_name} SET x = ?, y = ?, cluster_label = ? WHERE id = ?",
-                (float(row['x']), float(row['y']), cluster_labels[row['cluster']], row['id'])
-            )
-        else:
-            c.execute(
-                f"UPDATE {t_name} SET x = ?, y = ? WHERE id = ?",
-                (float(row['x']), float(row['y']), row['id'])
-            )
-
-    conn_r.commit(); conn_c.commit()
-    conn_r.close(); conn_c.close()
+    save_semantic_map(df, cluster_labels)
     print("✅ Local semantic mapping update finished.")
 
 if __name__ == "__main__":
+    init_db()  # embedding columns / pickle conversion
+    
     # 1. Update embeddings batch by batch
     print("Starting background embedding processing...")
     while update_embeddings_batch(100) > 0:
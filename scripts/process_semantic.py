@@ -1,10 +1,6 @@
 import os
 import sys
-import sqlite3
-import numpy as np
-import pandas as pd
 import json
-import pickle
 import time
 from sklearn.manifold import TSNE
 from sklearn.cluster import KMeans
@@ -12,35 +8,21 @@ from sklearn.cluster import KMeans
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from core.db import DB_NAME, CHAT_DB_NAME
-from core.gemini_client import get_embeddings, summarize_cluster
+from core.db import DB_NAME, CHAT_DB_NAME, RowQuery, init_db, save_embeddings, load_semantic_frame, save_semantic_map
+from core.gemini_client import get_embeddings, summarize_cluster, EMBEDDING_MODEL
 
 def update_embeddings_batch(batch_size=50):
     """Fetch missing embeddings from Gemini and store them. Batch size set to 50."""
     
-    # Check Reviews DB first
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id, content FROM reviews WHERE embedding IS NULL AND content IS NOT NULL AND content != '' LIMIT ?", (batch_size,))
-    rows = c.fetchall()
-    table_name = "reviews"
-    db_conn = conn
-    
-    if not rows:
-        conn.close()
-        # Fallback to check Chats DB
-        conn_c = sqlite3.connect(CHAT_DB_NAME)
-        c_c = conn_c.cursor()
-        c_c.execute("SELECT id, content FROM chat_messages WHERE embedding IS NULL AND content IS NOT NULL AND content != '' LIMIT ?", (batch_size,))
-        rows = c_c.fetchall()
-        table_name = "chat_messages"
-        db_conn = conn_c
-        c = c_c
-
-        if not rows:
-            print("No new data to embed in either database.")
-            conn_c.close()
-            return 0
+    # Check Reviews DB first, then fall back to the Chats DB
+    for db_path, table_name in ((DB_NAME, "reviews"), (CHAT_DB_NAME, "chat_messages")):
+        rows = RowQuery(table_name, "id, content") \
+            .where("embedding IS NULL AND content IS NOT NULL AND content != ''").limit(batch_size).fetchall(db_path)
+        if rows:
+            break
+    else:
+        print("No new data to embed in either database.")
+        return 0
     
     ids = [r[0] for r in rows]
     texts = [r[1][:500] for r in rows] # Limit text length for embedding
@@ -49,51 +31,26 @@ def update_embeddings_batch(batch_size=50):
     embeddings = get_embeddings(texts)
     
     if embeddings:
-        for rid, emb in zip(ids, embeddings):
-            # Store as binary pickle for SQLite
-            emb_blob = pickle.dumps(np.array(emb, dtype=np.float32))
-            c.execute(f"UPDATE {table_name} SET embedding = ? WHERE id = ?", (emb_blob, rid))
-        db_conn.commit()
+        # float32 BLOBs + embedding store rows
+        save_embeddings(db_path, table_name, ids, embeddings, model=EMBEDDING_MODEL)
         print(f"Successfully updated {len(ids)} embeddings in {table_name}.")
-        db_conn.close()
         return len(ids)
     else:
         print("Failed to get embeddings. Check API Key or limits.")
-        db_conn.close()
         return 0
 
 def run_semantic_clustering(n_clusters=40):
     """Perform T-SNE reduction and Clustering. Increased clusters for better granularity."""
     
-    # Fetch from both DBs
-    conn_r = sqlite3.connect(DB_NAME)
-    df_r = pd.read_sql_query("SELECT id, content, embedding FROM reviews WHERE embedding IS NOT NULL", conn_r)
-    if not df_r.empty: df_r['is_review'] = True
-    
-    conn_c = sqlite3.connect(CHAT_DB_NAME)
-    df_c = pd.read_sql_query("SELECT id, content, embedding FROM chat_messages WHERE embedding IS NOT NULL", conn_c)
-    if not df_c.empty: df_c['is_review'] = False
-    
-    if df_r.empty and df_c.empty:
-        df = pd.DataFrame()
-    elif df_r.empty:
-        df = df_c
-    elif df_c.empty:
-        df = df_r
-    else:
-        df = pd.concat([df_r, df_c], ignore_index=True)
+    # 1. One float32 matrix for both DBs, straight from the embedding store
+    df, X = load_semantic_frame()
     
     if len(df) < n_clusters:
         print(f"Not enough data for clustering (need at least {n_clusters} records).")
-        conn_r.close()
-        conn_c.close()
         return
 
     print(f"Processing clustering for {len(df)} records across both databases...")
     
-    # 1. Unpickle embeddings
-    X = np.array([pickle.loads(e) for e in df['embedding'].values])
-    
     # 2. T-SNE Reductions
     # Using small perplexity for small datasets
     tsne = TSNE(n_components=2, perplexity=min(30, len(df)-1), random_state=42, init='pca', learning_rate='auto')
@@ -128,30 +85,12 @@ def run_semantic_clustering(n_clusters=40):
             print(f"Skipping Cluster {i} due to API failure/limit. Will retry later.")
     
     # 5. Update Database
-    for _, row in df.iterrows():
-        is_rev = row.get('is_review', True)
-        c = conn_r.cursor() if is_rev else conn_c.cursor()
-        t_name = "reviews" if is_rev else "chat_messages"
-        
-        # Only update cluster_label if we actually generated a new one
-        if row['cluster'] in cluster_labels:
-            c.execute(
-                f"UPDATE {t_name} SET x = ?, y = ?, cluster_label = ? WHERE id = ?",
-                (float(row['x']), float(row['y']), cluster_labels[row['cluster']], row['id'])
-            )
-        else:
-            c.execute(
-                f"UPDATE {t_name} SET x = ?, y = ? WHERE id = ?",
-                (float(row['x']), float(row['y']), row['id'])
-            )
-    
-    conn_r.commit()
-    conn_c.commit()
-    conn_r.close()
-    conn_c.close()
+    save_semantic_map(df, cluster_labels)
     print("Semantic map updated successfully for both databases!")
 
 if __name__ == "__main__":
+    init_db()  # embedding columns / pickle conversion
+    
     # 1. Update missing embeddings (in batches until done)
     print("Starting embedding update...")
     total_updated = 0
@@ -0,0 +1,59 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import core.db as db
+
+
+class EmbeddingUpgradeTest(unittest.TestCase):
+    """Pickled embeddings from before the float32 store must survive the first save after upgrading."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._saved = (db.DB_NAME, db.CHAT_DB_NAME, db.EMBEDDING_DIR, db.ARCHIVE_DIR)
+        db.DB_NAME = os.path.join(self.tmp, "reviews.db")
+        db.CHAT_DB_NAME = os.path.join(self.tmp, "chats.db")
+        db.EMBEDDING_DIR = os.path.join(self.tmp, "embeddings")
+        db.ARCHIVE_DIR = os.path.join(self.tmp, "archive")
+        db.init_db()
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_NAME, db.CHAT_DB_NAME, db.EMBEDDING_DIR, db.ARCHIVE_DIR = self._saved
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_legacy_embeddings_kept_after_append(self):
+        rng = np.random.default_rng(0)
+        conn = db.get_connection(db.DB_NAME)
+        legacy = {}
+        for i in range(80):
+            rid = f"old{i:03d}"
+            legacy[rid] = rng.standard_normal(8).astype(np.float32)
+            conn.execute("INSERT INTO reviews (id, content, review_date, source) VALUES (?, ?, '2026-01-01', 'youtube')",
+                         (rid, f"text {i}"))
+            conn.execute("UPDATE reviews SET embedding = ?, embedding_row = NULL WHERE id = ?",
+                         (pickle.dumps(legacy[rid]), rid))
+        for i in range(5):
+            conn.execute("INSERT INTO reviews (id, content, review_date, source) VALUES (?, ?, '2026-01-02', 'youtube')",
+                         (f"new{i}", f"new text {i}"))
+        conn.commit()
+        db._migrate_embeddings(conn, "reviews")  # the pickle conversion the upgrade runs
+
+        new = rng.standard_normal((5, 8)).astype(np.float32)
+        db.save_embeddings(db.DB_NAME, "reviews", [f"new{i}" for i in range(5)], new, model="test-model")
+
+        keys, matrix = db.load_embedding_matrix()
+        self.assertEqual(len(keys), 85)
+        vectors = {rid: row for (_, rid), row in zip(keys, matrix)}
+        for rid, vec in legacy.items():
+            np.testing.assert_array_equal(vectors[rid], vec)
+        for i in range(5):
+            np.testing.assert_array_equal(vectors[f"new{i}"], new[i])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import random
+import unittest
+
+import core.matcher as matcher
+
+
+def _build(patterns, use_c):
+    saved = matcher.HAS_PYAHOCORASICK
+    matcher.HAS_PYAHOCORASICK = use_c
+    try:
+        return matcher.KeywordAutomaton(patterns)
+    finally:
+        matcher.HAS_PYAHOCORASICK = saved
+
+
+def _paths():
+    return [True, False] if matcher.HAS_PYAHOCORASICK else [False]
+
+
+class FindOutermostTest(unittest.TestCase):
+    """Only matches nested inside a longer match are dropped."""
+
+    def test_nested_alias_suppressed(self):
+        for use_c in _paths():
+            automaton = _build(["悟空", "孙悟空（超一）"], use_c)
+            self.assertEqual(automaton.find_outermost("孙悟空（超一）很强"), ["孙悟空（超一）"])
+            self.assertEqual(automaton.find_outermost("孙悟空（超一）和悟空"), ["孙悟空（超一）", "悟空"])
+
+    def test_partial_overlap_keeps_both(self):
+        for use_c in _paths():
+            automaton = _build(["路飞", "飞龙", "abc", "cde"], use_c)
+            self.assertEqual(automaton.find_outermost("路飞龙"), ["路飞", "飞龙"])
+            self.assertEqual(automaton.find_outermost("xabcdex"), ["abc", "cde"])
+
+    def test_same_start_keeps_longest(self):
+        for use_c in _paths():
+            self.assertEqual(_build(["ab", "abc", "b"], use_c).find_outermost("abcb"), ["abc", "b"])
+
+
+@unittest.skipUnless(matcher.HAS_PYAHOCORASICK, "pyahocorasick not installed")
+class AutomatonPathsAgreeTest(unittest.TestCase):
+    """The pyahocorasick path and the pure-Python fallback must return the same matches."""
+
+    def assertPathsAgree(self, patterns, text):
+        c_path, fallback = _build(patterns, True), _build(patterns, False)
+        self.assertEqual(c_path.find_outermost(text), fallback.find_outermost(text), (patterns, text))
+        self.assertEqual(c_path.findall(text), fallback.findall(text), (patterns, text))
+
+    def test_partial_prefix_of_longer_alias(self):
+        # "孙悟空" is only a prefix of the long alias; the "悟空" inside it still counts
+        patterns = ["悟空", "孙悟空（超一）"]
+        self.assertEqual(_build(patterns, True).find_outermost("我喜欢孙悟空"), ["悟空"])
+        self.assertPathsAgree(patterns, "我喜欢孙悟空")
+        self.assertPathsAgree(patterns, "孙悟空（超一）和悟空")
+
+    def test_overlapping_aliases(self):
+        self.assertPathsAgree(["abc", "cde", "bc"], "xabcdex")
+        self.assertPathsAgree(["路飞", "飞路", "路"], "路飞路飞")
+
+    def test_random_texts(self):
+        rng = random.Random(0)
+        alphabet = "孙悟空超一路飞ab"
+        for _ in range(2000):
+            patterns = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 14)))
+            self.assertPathsAgree(patterns, text)
+
+
+if __name__ == "__main__":
+    unittest.main()